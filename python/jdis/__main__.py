@@ -1,35 +1,50 @@
+import time
+STARTUP = time.perf_counter()
+
 import asyncio
-import aiohttp
+import contextlib
 import traceback
 import os
-from .types import ServerMessage, ServerMessageTickInfo, ServerMessageTickInfoDead, ServerMessageInfo, LinkMessage, SetActionMessage, ServerMessageGameStart, ServerMessageIncorrectLogin
-from .bot import TOKEN, on_tick, on_game_start
+from .types import ServerMessage, ServerMessageTickInfo, ServerMessageTickInfoDead, ServerMessageInfo, LinkMessage, ServerMessageGameStart, ServerMessageIncorrectLogin
+from .bot import TOKEN, on_tick, on_game_start, on_idle, on_game_end
+from .encoding import encode_action
+from .warmup import start_warm_up, stop_warm_up
+from .profiling import SlowTickProfiler
 
 # A tick on the backend is 500ms. Give at most 450ms of compute time to account
 # for network latency and variance.
 MAX_TICK_COMPUTE_TIME = 0.450
 
+# Sampling profiler dumping the slow ticks, set JDIS_PROFILE=<folder> to enable
+profiler = SlowTickProfiler.from_env(MAX_TICK_COMPUTE_TIME)
+
 isFirstTick = True
+lastAction = None
 
 async def on_message(data):
-    global isFirstTick
+    global isFirstTick, lastAction
     msg = ServerMessage.from_json(data)
     match msg:
         case ServerMessageGameStart():
+            await stop_warm_up()
             isFirstTick = False
             await on_game_start()
         case ServerMessageTickInfo():
+            await stop_warm_up()
             try:
-                async with asyncio.timeout(MAX_TICK_COMPUTE_TIME):
-                    if isFirstTick:
-                        isFirstTick = False
-                        await on_game_start()
-                    action = await on_tick(msg.state)
-                return SetActionMessage(action).to_json()
+                with profiler.capture(data) if profiler else contextlib.nullcontext():
+                    async with asyncio.timeout(MAX_TICK_COMPUTE_TIME):
+                        if isFirstTick:
+                            isFirstTick = False
+                            await on_game_start()
+                        action = await on_tick(msg.state)
+                lastAction = action
+                return encode_action(action)
             except TimeoutError:
                 print("WARNING: Your on_tick function was cancelled because it was taking too long.")
         case ServerMessageTickInfoDead():
             print("You are dead...")
+            on_game_end()
         case ServerMessageInfo():
             return ConfirmMessage(TOKEN)
         case ServerMessageIncorrectLogin():
@@ -37,16 +52,28 @@ async def on_message(data):
             exit()
 
 async def main():
+    global lastAction
+    import aiohttp
+    print(f"Startup: imports took {(time.perf_counter() - STARTUP) * 1000:.1f}ms")
+
     WS = os.getenv("WS", "ws")
     async with aiohttp.ClientSession() as client:
         async with client.ws_connect(f"wss://games.jdis.ca/{WS}") as ws:
             await ws.send_str(LinkMessage(TOKEN).to_json())
+            # The server answers the link and waits for the game to start,
+            # use that time to make the first tick as fast as the others
+            start_warm_up()
             async for msg in ws:
                 if msg.type == aiohttp.WSMsgType.TEXT:
                     try:
                         reply = await on_message(msg.data)
                         if reply:
                             await ws.send_str(reply)
+                        if profiler:
+                            profiler.flush()
+                        if lastAction is not None:
+                            on_idle(lastAction)
+                            lastAction = None
                     except Exception as e:
                         traceback.print_exception(e)
 
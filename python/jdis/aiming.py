@@ -0,0 +1,189 @@
+from .types import *
+from .constants import MAP_SIZE, SCORING
+
+# Longest ray kept in the table, longer weapon ranges are clamped to it
+MAX_RANGE = 16
+
+# Cells that stop a projectile
+SHOT_BLOCKING_CELLS = (Cell.resistance,)
+
+DIRECTIONS = list(Direction._elems.values())
+
+# Weight of an enemy's current position and of its predicted position (same
+# velocity for the projectile's time of flight) when the enemy is moving
+CURRENT_WEIGHT = 0.6
+PREDICTED_WEIGHT = 0.4
+
+# Indices of the four cardinal directions in DIRECTIONS
+CARDINAL_INDICES = [d for d, step in enumerate(DIRECTIONS) if abs(step.x) + abs(step.y) == 1]
+
+def pattern_rays(pattern: str, d: int) -> list[tuple[int, list[tuple[int, int]]]]:
+    """
+    Projectiles fired by a weapon aimed along DIRECTIONS[d]: (direction index
+    of the projectile, cells hit around it relative to its position)
+    """
+    pattern = str(pattern).lower()
+    step = DIRECTIONS[d]
+    if pattern == "line":
+        # Three projectiles side by side
+        return [(d, [(0, 0), (-step.y, step.x), (step.y, -step.x)])]
+    if pattern == "star":
+        # One projectile along each cardinal direction, whatever the aim
+        return [(c, [(0, 0)]) for c in CARDINAL_INDICES]
+    if pattern == "box":
+        return [(d, [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)])]
+    return [(d, [(0, 0)])]
+
+class RayTable:
+    """
+    For every cell and each of the 8 directions, the number of free cells a
+    projectile crosses before hitting a wall or the map edge (at most
+    MAX_RANGE). Kept up to date cell by cell as walls are learned.
+    """
+
+    def __init__(self, width: int = MAP_SIZE, height: int = MAP_SIZE):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.blocked = bytearray(self.size)
+        self.clear = [bytearray(self.size) for _ in DIRECTIONS]
+        self._blank = None
+        self.reset()
+
+    def _recompute(self, d: int):
+        """Fill the whole table of one direction, farthest cells first"""
+        step = DIRECTIONS[d]
+        width, height = self.width, self.height
+        blocked, clear = self.blocked, self.clear[d]
+        ys = range(height - 1, -1, -1) if step.y > 0 else range(height)
+        xs = range(width - 1, -1, -1) if step.x > 0 else range(width)
+        offset = step.y * width + step.x
+        for y in ys:
+            ny = y + step.y
+            for x in xs:
+                nx = x + step.x
+                i = y * width + x
+                if 0 <= nx < width and 0 <= ny < height and not blocked[i + offset]:
+                    clear[i] = min(MAX_RANGE, clear[i + offset] + 1)
+                else:
+                    clear[i] = 0
+
+    def reset(self):
+        """Empty map (computed once, then copied)"""
+        self.blocked[:] = bytes(self.size)
+        if self._blank is None:
+            for d in range(len(DIRECTIONS)):
+                self._recompute(d)
+            self._blank = [bytes(table) for table in self.clear]
+        else:
+            for table, blank in zip(self.clear, self._blank):
+                table[:] = blank
+
+    def update_cell(self, pos: Vector, cell: Cell):
+        """Update the rays going through a cell whose type changed"""
+        if not (0 <= pos.x < self.width and 0 <= pos.y < self.height):
+            return
+        i = pos.y * self.width + pos.x
+        blocked = 1 if cell in SHOT_BLOCKING_CELLS else 0
+        if self.blocked[i] == blocked:
+            return
+        self.blocked[i] = blocked
+
+        # Only the cells behind i (looking along the ray) can change
+        for d, step in enumerate(DIRECTIONS):
+            clear = self.clear[d]
+            offset = step.y * self.width + step.x
+            x, y = pos.x, pos.y
+            for _ in range(MAX_RANGE):
+                x -= step.x
+                y -= step.y
+                if not (0 <= x < self.width and 0 <= y < self.height):
+                    break
+                j = y * self.width + x
+                value = 0 if self.blocked[j + offset] else min(MAX_RANGE, clear[j + offset] + 1)
+                if clear[j] == value and j + offset != i:
+                    break
+                clear[j] = value
+
+    def reach(self, pos: Vector, d: int) -> int:
+        if not (0 <= pos.x < self.width and 0 <= pos.y < self.height):
+            return 0
+        return self.clear[d][pos.y * self.width + pos.x]
+
+class Shot:
+    """A projectile to fire and its expected value"""
+
+    def __init__(self, weapon: InventoryItemProjectile, direction: Vector, value: float):
+        self.weapon = weapon
+        self.direction = direction
+        self.value = value
+
+class Aimer:
+    """Picks the (weapon, direction) pair with the highest expected damage"""
+
+    def __init__(self, rays: RayTable):
+        self.rays = rays
+        self._tick = -1
+        self._shot = None
+
+    def motions(self, state: GameState) -> list[tuple]:
+        """(enemy index, position, velocity or None if standing still) of every enemy"""
+        motions = []
+        for e, enemy in enumerate(state.enemies):
+            velocity = enemy.position - enemy.last_position if enemy.last_position else None
+            if velocity is not None and velocity.x == 0 and velocity.y == 0:
+                velocity = None
+            motions.append((e, enemy.position, velocity))
+        return motions
+
+    def best_shot(self, state: GameState, memory) -> Shot:
+        """Best shot for this tick (cached), or None if nothing can be hit"""
+        if self._tick == memory.tick:
+            return self._shot
+        self._tick = memory.tick
+        self._shot = None
+
+        weapons = memory.inventory.projectiles
+        if not weapons or not state.enemies:
+            return None
+        motions = self.motions(state)
+        enemies = state.enemies
+        origin = state.player.position
+
+        best = None
+        for d, step in enumerate(DIRECTIONS):
+            for weapon in weapons:
+                speed = max(1, weapon.speed)
+                hits = {}
+                for r, offsets in pattern_rays(weapon.pattern, d):
+                    ray = DIRECTIONS[r]
+                    length = min(weapon.range, self.rays.reach(origin, r))
+                    for k in range(1, length + 1):
+                        # A moving enemy is expected where its velocity takes it
+                        # by the time the projectile gets k cells away
+                        flight = -(-k // speed)
+                        cx, cy = origin.x + ray.x * k, origin.y + ray.y * k
+                        for ox, oy in offsets:
+                            hx, hy = cx + ox, cy + oy
+                            for e, pos, velocity in motions:
+                                if velocity is None:
+                                    weight = 1.0 if pos.x == hx and pos.y == hy else 0
+                                elif pos.x + velocity.x * flight == hx and pos.y + velocity.y * flight == hy:
+                                    weight = PREDICTED_WEIGHT
+                                else:
+                                    weight = CURRENT_WEIGHT if pos.x == hx and pos.y == hy else 0
+                                if weight > hits.get(e, 0):
+                                    hits[e] = weight
+                if not hits:
+                    continue
+
+                value = 0
+                for e, weight in hits.items():
+                    value += weapon.damage * weight
+                    if weapon.damage >= enemies[e].hp + enemies[e].shield:
+                        value += SCORING["eliminate_player"] * weight
+                if best is None or value > best.value:
+                    best = Shot(weapon, step, value)
+
+        self._shot = best
+        return best
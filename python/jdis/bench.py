@@ -0,0 +1,220 @@
+"""
+Micro-benchmarks for the starter kit. Run them from the `python` folder with:
+
+    python3 -m jdis.bench [name ...]
+"""
+import os
+import random
+import sys
+import time
+from .constants import MAP_SIZE
+from .pathfinding import SearchGrid
+
+def random_map(seed: int = 0, density: float = 0.2) -> list[list[int]]:
+    """Random MAP_SIZE x MAP_SIZE matrix (1 = walkable, 0 = blocked)"""
+    rng = random.Random(seed)
+    return [[0 if rng.random() < density else 1 for _ in range(MAP_SIZE)] for _ in range(MAP_SIZE)]
+
+def random_queries(matrix, count: int, seed: int = 1) -> list[tuple]:
+    """Random pairs of walkable cells"""
+    rng = random.Random(seed)
+    free = [(x, y) for y, row in enumerate(matrix) for x, v in enumerate(row) if v]
+    return [(rng.choice(free), rng.choice(free)) for _ in range(count)]
+
+def timed(fn, *args, repeat: int = 1) -> float:
+    """Best wall time of fn(*args) in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def report(name: str, ms: float, count: int):
+    print(f"  {name:<28} {ms:9.2f} ms total  {ms / count:8.3f} ms/op")
+
+def bench_pathfinding(queries: int = 50):
+    """Compare the flat-array engine with python-pathfinding on 125x125 maps"""
+    print(f"pathfinding: {queries} random queries on a {MAP_SIZE}x{MAP_SIZE} map")
+    matrix = random_map()
+    pairs = random_queries(matrix, queries)
+
+    grid = SearchGrid()
+    for y, row in enumerate(matrix):
+        for x, v in enumerate(row):
+            grid.set_walkable(y * MAP_SIZE + x, v)
+    idx = [(a[1] * MAP_SIZE + a[0], b[1] * MAP_SIZE + b[0]) for a, b in pairs]
+
+    # Sanity check: every engine must agree on path lengths
+    for s, e in idx:
+        lengths = {len(grid.astar(s, e)), len(grid.jps(s, e)), len(grid.bfs(s, e))}
+        assert len(lengths) == 1, f"engines disagree on {s}->{e}: {lengths}"
+
+    for name in ("astar", "jps", "bfs"):
+        search = getattr(grid, name)
+        report(f"SearchGrid.{name}", timed(lambda: [search(s, e) for s, e in idx], repeat=3), queries)
+
+    try:
+        from pathfinding.core.diagonal_movement import DiagonalMovement
+        from pathfinding.core.grid import Grid
+        from pathfinding.finder.a_star import AStarFinder
+    except ImportError:
+        print("  (python-pathfinding not installed, skipping AStarFinder)")
+        return
+
+    finder = AStarFinder(diagonal_movement=DiagonalMovement.never)
+
+    def run_library():
+        # Same as the previous Pathfinder: one fresh Grid per search
+        for (sx, sy), (ex, ey) in pairs:
+            g = Grid(matrix=matrix)
+            finder.find_path(g.node(sx, sy), g.node(ex, ey), g)
+
+    report("AStarFinder (new Grid)", timed(run_library), queries)
+
+def bench_hierarchy(queries: int = 50):
+    """Long-range queries: flat A* against the cluster abstraction"""
+    from .pathfinding import Pathfinder, LONG_RANGE, REFINE_STEPS
+    print(f"hierarchy: {queries} queries at least {LONG_RANGE} cells apart")
+    matrix = random_map()
+    pathfinder = Pathfinder()
+    grid = pathfinder.grid
+    for y, row in enumerate(matrix):
+        for x, v in enumerate(row):
+            grid.set_walkable(y * MAP_SIZE + x, v)
+    pathfinder.clusters.invalidate_all()
+    pairs = [(a, b) for a, b in random_queries(matrix, queries * 4)
+             if abs(a[0] - b[0]) + abs(a[1] - b[1]) >= LONG_RANGE][:queries]
+    idx = [(a[1] * MAP_SIZE + a[0], b[1] * MAP_SIZE + b[0]) for a, b in pairs]
+
+    report("ClusterMap full build", timed(pathfinder.clusters.update), 1)
+    report("SearchGrid.astar", timed(lambda: [grid.astar(s, e) for s, e in idx], repeat=3), len(idx))
+    clusters = pathfinder.clusters
+    report("ClusterMap search+refine",
+           timed(lambda: [clusters.refine(clusters.abstract_path(s, e), REFINE_STEPS) for s, e in idx], repeat=3), len(idx))
+
+def sample_actions() -> list:
+    """Typical mix of actions sent to the server"""
+    from .types import (MoveAction, PhaseAction, OpenChestAction, UseItemAction, UseItemBuff, UseItemNuke,
+                        UseItemProjectile, UseItemPlaced, SkipAction, SegFaultAction, Vector, CardinalDirection, Direction)
+    return [
+        MoveAction(Vector(61, 40)),
+        MoveAction(Vector(3, 124)),
+        PhaseAction(CardinalDirection.left),
+        OpenChestAction(Vector(12, 7)),
+        UseItemAction("Repair", UseItemBuff()),
+        UseItemAction("Bluescreen", UseItemNuke()),
+        UseItemAction("Ping", UseItemProjectile(Direction.downRight)),
+        UseItemAction("Resistance", UseItemPlaced(Vector(5, 6), True)),
+        SkipAction(),
+        SegFaultAction(),
+    ]
+
+def bench_encoding(rounds: int = 2000):
+    """SetActionMessage(action).to_json() against the precompiled encoder"""
+    from .types import SetActionMessage
+    from .encoding import encode_action
+    actions = sample_actions()
+    print(f"encoding: {rounds} rounds of {len(actions)} actions")
+    for action in actions:
+        assert encode_action(action) == SetActionMessage(action).to_json(), action
+
+    count = rounds * len(actions)
+    report("SetActionMessage.to_json", timed(lambda: [SetActionMessage(a).to_json() for _ in range(rounds) for a in actions], repeat=3), count)
+    report("encode_action", timed(lambda: [encode_action(a) for _ in range(rounds) for a in actions], repeat=3), count)
+
+def soak_state(rng: random.Random, tick: int, x: int, y: int) -> dict:
+    """
+    Synthetic tick: fixed walls, a firewall closing in from the edges (the
+    whole map burns after MAP_SIZE * 2 ticks), one enemy and a few objects
+    """
+    fire = tick // 4
+    cells = []
+    for i in range(49):
+        cx, cy = x - 3 + i % 7, y - 3 + i // 7
+        if min(cx, cy, MAP_SIZE - 1 - cx, MAP_SIZE - 1 - cy) < fire:
+            cells.append("firewall")
+        else:
+            cells.append("resistance" if (cx * 31 + cy * 17) % 7 == 0 else "groundPlane")
+    def spot():
+        return {"x": x + rng.randint(-3, 3), "y": y + rng.randint(-3, 3)}
+    player = {"name": "soak", "score": 0, "kills": 0, "hp": 100, "shield": 0, "position": {"x": x, "y": y},
+              "last_position": {"x": x, "y": y}, "inventory": [], "effects": []}
+    enemy = dict(player, name="enemy", position=spot(), last_position=spot())
+    objects = [{"type": "chest", "position": spot()} for _ in range(3)]
+    objects += [{"type": "trap", "position": spot(), "owner": "enemy", "name": "WindowsDefender", "damage": 10}
+                for _ in range(3)]
+    return {
+        "player": player,
+        "enemies": [enemy],
+        "stats": {},
+        "ground": {"width": 7, "height": 7, "data": cells, "offset": {"x": x - 3, "y": y - 3}},
+        "objects": objects,
+        "projectiles": [],
+    }
+
+def resident_memory() -> int:
+    """Resident set size of the process in bytes, or 0 where /proc is missing"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+def bench_soak(games: int = 4, ticks: int = 600, growth: float = 0.1):
+    """
+    Many consecutive games on one GameMemory, jumping around the map so that
+    every capped structure overflows and gets evicted. Every game replays the
+    same ticks, so the traced memory (tracemalloc) and the resident memory at
+    the end of each game must stay within `growth` of the end of the first one
+    """
+    import contextlib
+    import io
+    import tracemalloc
+    from .types import GameState
+    from .memory import GameMemory
+    from . import memory as limits
+    caps = {
+        "exploration_frontier": limits.MAX_FRONTIER,
+        "last_seen": limits.MAX_LAST_SEEN,
+        "firewall_positions": limits.MAX_FIREWALL_POSITIONS,
+    }
+    print(f"soak: {games} games of {ticks} ticks")
+    with contextlib.redirect_stdout(io.StringIO()):
+        memory = GameMemory()
+    tracemalloc.start()
+    baseline = baseline_rss = None
+    start = time.perf_counter()
+    for game in range(games):
+        with contextlib.redirect_stdout(io.StringIO()):
+            memory.reset()
+            rng = random.Random(0)
+            for tick in range(ticks):
+                x, y = rng.randrange(3, MAP_SIZE - 3), rng.randrange(3, MAP_SIZE - 3)
+                memory.update(GameState.from_jsonable(soak_state(rng, tick, x, y)))
+        sizes = memory.footprint()
+        for name, cap in caps.items():
+            assert memory.evicted[name] > 0, f"{name} never reached its cap"
+            assert sizes[name][0] <= cap, f"{name} holds {sizes[name][0]} entries, cap is {cap}"
+
+        current, rss = tracemalloc.get_traced_memory()[0], resident_memory()
+        baseline = baseline or current
+        baseline_rss = baseline_rss or rss
+        print(f"  game {game}: {current / 1024:8.0f} KB traced, {rss / 1024:8.0f} KB resident, "
+              + ", ".join(f"{name} {sizes[name][0]} (evicted {memory.evicted[name]})" for name in caps))
+    tracemalloc.stop()
+    assert current <= baseline * (1 + growth), f"traced memory grew from {baseline} to {current} bytes"
+    assert rss <= baseline_rss * (1 + growth), f"resident memory grew from {baseline_rss} to {rss} bytes"
+    report("GameMemory.update", (time.perf_counter() - start) * 1000, games * ticks)
+
+BENCHMARKS = {
+    "pathfinding": bench_pathfinding,
+    "hierarchy": bench_hierarchy,
+    "encoding": bench_encoding,
+    "soak": bench_soak,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
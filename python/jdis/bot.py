@@ -1,18 +1,35 @@
 import typing
+import time
 from .utils import *
-from .strategy import StrategySelector
-from .memory import GameMemory
 
 TOKEN = "5dxymvfr"
 
-# Initialize game memory and strategy selector
-memory = GameMemory()
-strategy_selector = StrategySelector()
+# Game memory and strategy selector, created by setup()
+memory = None
+strategy_selector = None
+
+def setup():
+    """
+    Heavy imports and allocations, deferred until the bot actually plays.
+    Called by the warm-up during the handshake, or by the first tick.
+    """
+    global memory, strategy_selector
+    if memory is not None:
+        return
+    start = time.perf_counter()
+    from .strategy import StrategySelector
+    from .memory import GameMemory
+    print(f"Imported strategy and memory in {(time.perf_counter() - start) * 1000:.1f}ms")
+    memory = GameMemory()
+    # use_search=True picks actions with rollouts instead of fixed priorities
+    strategy_selector = StrategySelector(use_search=False)
 
 async def on_tick(state: GameState) -> typing.Union[MoveAction, PhaseAction, OpenChestAction, UseItemAction, SegFaultAction, SkipAction]:
     """
     Main tick handler - updates memory and selects best action
     """
+    setup()
+
     # Update game memory with current state
     memory.update(state)
     
@@ -26,8 +43,24 @@ async def on_tick(state: GameState) -> typing.Union[MoveAction, PhaseAction, Ope
     # Execute the strategy and return the action
     #return await strategy.execute(state, memory)
 
+def on_idle(action):
+    """
+    Called once the action has been sent, starts precomputing for the next
+    tick while we wait for it
+    """
+    if memory is not None:
+        memory.speculator.start(action)
+
 async def on_game_start():
     """
     Called once at game start - reset memory
     """
-    memory.reset()
\ No newline at end of file
+    setup()
+    memory.reset()
+
+def on_game_end():
+    """
+    Called when the player dies, saves what was learned about the map
+    """
+    if memory is not None:
+        memory.save_map()
@@ -32,4 +32,10 @@ ITEM_PRIORITY = {
     "Buffer": 40,
     "SimpleResistance": 30,
     "WindowsDefender": 20
-}
\ No newline at end of file
+}
+
+# The arena is a square of MAP_SIZE x MAP_SIZE cells
+MAP_SIZE = 125
+
+# Damage dealt by a firewall cell every tick
+FIREWALL_DAMAGE = 10
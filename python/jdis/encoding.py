@@ -0,0 +1,79 @@
+import json
+from .types import *
+
+# Fast serialization of SetActionMessage. Each action type has a precompiled
+# template producing exactly the same JSON as SetActionMessage(action).to_json(),
+# and the actions without parameters are encoded once and cached.
+
+_PREFIX = '{"action": '
+_SUFFIX = ', "type": "action"}'
+
+def _wrap(action_json: str) -> str:
+    return _PREFIX + action_json + _SUFFIX
+
+_STATIC = {
+    SkipAction: _wrap('{"action": "skip"}'),
+    SegFaultAction: _wrap('{"action": "segFault"}'),
+}
+
+_PHASES = {
+    direction: _wrap('{"direction": "%s", "action": "phase"}' % name)
+    for name, direction in CardinalDirection._elems.items()
+}
+
+_DIRECTIONS = {direction: name for name, direction in Direction._elems.items()}
+
+_names = {}
+
+def _name(name: str) -> str:
+    encoded = _names.get(name)
+    if encoded is None:
+        encoded = _names[name] = json.dumps(name)
+    return encoded
+
+def _position(pos: Vector) -> str:
+    return f'{{"x": {pos.x}, "y": {pos.y}}}'
+
+def _move(action: MoveAction) -> str:
+    return f'{_PREFIX}{{"position": {_position(action.position)}, "action": "move"}}{_SUFFIX}'
+
+def _phase(action: PhaseAction) -> str:
+    encoded = _PHASES.get(action.direction)
+    return encoded if encoded is not None else SetActionMessage(action).to_json()
+
+def _open_chest(action: OpenChestAction) -> str:
+    return f'{_PREFIX}{{"position": {_position(action.position)}, "action": "openChest"}}{_SUFFIX}'
+
+def _use_item(action: UseItemAction) -> str:
+    data = action.data
+    if isinstance(data, UseItemProjectile):
+        direction = _DIRECTIONS.get(data.direction)
+        data_json = f'{{"direction": {json.dumps(direction)}, "type": "projectile"}}'
+    elif isinstance(data, UseItemPlaced):
+        vertical = "true" if data.placeRectangleVertical else "false"
+        data_json = f'{{"position": {_position(data.position)}, "placeRectangleVertical": {vertical}, "type": "placed"}}'
+    elif isinstance(data, UseItemBuff):
+        data_json = '{"type": "buff"}'
+    elif isinstance(data, UseItemNuke):
+        data_json = '{"type": "nuke"}'
+    else:
+        return SetActionMessage(action).to_json()
+    return f'{_PREFIX}{{"name": {_name(action.name)}, "data": {data_json}, "action": "useItem"}}{_SUFFIX}'
+
+_ENCODERS = {
+    MoveAction: _move,
+    PhaseAction: _phase,
+    OpenChestAction: _open_chest,
+    UseItemAction: _use_item,
+}
+
+def encode_action(action) -> str:
+    """Same output as SetActionMessage(action).to_json(), without the generic serde path"""
+    cls = type(action)
+    cached = _STATIC.get(cls)
+    if cached is not None:
+        return cached
+    encoder = _ENCODERS.get(cls)
+    if encoder is not None:
+        return encoder(action)
+    return SetActionMessage(action).to_json()
@@ -0,0 +1,144 @@
+from .types import *
+from .constants import MAP_SIZE
+
+# The player sees a (2 * VIEW_RADIUS + 1)^2 window around itself
+VIEW_RADIUS = 3
+
+# Targets farther than this (in steps) are not considered
+EXPLORE_HORIZON = 60
+
+# Steps added to the distance, so that close targets with a small gain don't
+# always win over slightly farther ones with a big gain
+STEP_OFFSET = 2
+
+# Ticks of margin required between reaching a target and the firewall reaching it
+FIRE_MARGIN = 5
+
+class ExplorationScorer:
+    """
+    Unknown-cell mask of the map with its summed-area table, so the number of
+    unknown cells the view would uncover from any cell is an O(1) lookup. The
+    table is updated lazily: only the part below and right of the cells
+    revealed since the last query is recomputed.
+    """
+
+    def __init__(self, width: int = MAP_SIZE, height: int = MAP_SIZE):
+        self.width = width
+        self.height = height
+        self.unknown = bytearray(width * height)
+        # sat[(y + 1) * (width + 1) + x + 1] = unknown cells in [0, x] x [0, y]
+        self.sat = [0] * ((width + 1) * (height + 1))
+        self.revealed = 0  # cells revealed so far
+        self._blank = None
+        self.reset()
+
+    def reset(self):
+        """Everything unknown (computed once, then copied)"""
+        self.unknown[:] = b"\x01" * (self.width * self.height)
+        if self._blank is None:
+            self.dirty = (0, 0)
+            self._refresh()
+            self._blank = list(self.sat)
+        else:
+            self.sat[:] = self._blank
+        self.dirty = None
+        self.revealed = 0
+
+    def copy(self) -> "ExplorationScorer":
+        """Independent copy, to reveal cells ahead of time (see Speculator)"""
+        other = ExplorationScorer.__new__(ExplorationScorer)
+        other.width, other.height = self.width, self.height
+        other.unknown = bytearray(self.unknown)
+        other.sat = list(self.sat)
+        other.revealed = self.revealed
+        other.dirty = self.dirty
+        other._blank = self._blank
+        return other
+
+    def reveal(self, pos: Vector):
+        if not (0 <= pos.x < self.width and 0 <= pos.y < self.height):
+            return
+        i = pos.y * self.width + pos.x
+        if not self.unknown[i]:
+            return
+        self.unknown[i] = 0
+        self.revealed += 1
+        if self.dirty is None:
+            self.dirty = (pos.x, pos.y)
+        else:
+            self.dirty = (min(self.dirty[0], pos.x), min(self.dirty[1], pos.y))
+
+    def reveal_all(self, known: bytearray):
+        """Mark every cell set in `known` (one byte per cell) as revealed"""
+        for i in range(self.width * self.height):
+            if known[i] and self.unknown[i]:
+                self.unknown[i] = 0
+                self.revealed += 1
+        self.dirty = (0, 0)
+
+    def _refresh(self):
+        """Recompute the table from the top-left-most revealed cell"""
+        if self.dirty is None:
+            return
+        x0, y0 = self.dirty
+        width, unknown, sat = self.width, self.unknown, self.sat
+        stride = width + 1
+        for y in range(y0, self.height):
+            row, above = (y + 1) * stride, y * stride
+            left = sat[row + x0]
+            above_left = sat[above + x0]
+            base = y * width
+            for x in range(x0, width):
+                above_here = sat[above + x + 1]
+                left = unknown[base + x] + left + above_here - above_left
+                sat[row + x + 1] = left
+                above_left = above_here
+        self.dirty = None
+
+    def gain(self, x: int, y: int) -> int:
+        """Unknown cells in the view centered on (x, y)"""
+        x0, y0 = max(0, x - VIEW_RADIUS), max(0, y - VIEW_RADIUS)
+        x1, y1 = min(self.width, x + VIEW_RADIUS + 1), min(self.height, y + VIEW_RADIUS + 1)
+        if x0 >= x1 or y0 >= y1:
+            return 0
+        stride, sat = self.width + 1, self.sat
+        return sat[y1 * stride + x1] - sat[y0 * stride + x1] - sat[y1 * stride + x0] + sat[y0 * stride + x0]
+
+    def best_target(self, memory, distances: list[int] = None, fire_eta: list[int] = None, reach=None) -> Vector:
+        """
+        Reachable cell with the most unknown cells uncovered per step, that
+        the firewall won't burn before we get there. Cells an enemy reaches
+        first are only picked when nothing else is left. None if nothing
+        is left to discover. The fields default to the memory's current ones.
+        """
+        self._refresh()
+        distances = distances if distances is not None else memory.get_distance_field()
+        fire_eta = fire_eta if fire_eta is not None else memory.get_fire_eta()
+        reach = reach if reach is not None else memory.get_enemy_reach()
+        width = self.width
+
+        best, best_key = -1, None
+        stride, sat, r = width + 1, self.sat, VIEW_RADIUS
+        # A view holds at most `most` cells, so once a safe target is found
+        # the cells farther than `horizon` can't beat it
+        most = (2 * r + 1) ** 2
+        horizon = EXPLORE_HORIZON
+        for i, d in enumerate(distances):
+            if d <= 0 or d > horizon or fire_eta[i] <= d + FIRE_MARGIN:
+                continue
+            # gain() inlined, this runs for every reachable cell
+            x, y = i % width, i // width
+            x0, y0 = max(0, x - r), max(0, y - r)
+            x1, y1 = min(width, x + r + 1), min(self.height, y + r + 1)
+            gain = sat[y1 * stride + x1] - sat[y0 * stride + x1] - sat[y1 * stride + x0] + sat[y0 * stride + x0]
+            if not gain:
+                continue
+            score = gain / (d + STEP_OFFSET)
+            if best_key is not None and score <= best_key[1] and best_key[0]:
+                continue
+            key = (not reach.line_of_fire[i] and reach.margin(i) > 0, score)
+            if best_key is None or key > best_key:
+                best, best_key = i, key
+                if key[0]:
+                    horizon = min(horizon, most / score - STEP_OFFSET)
+        return Vector(best % width, best // width) if best != -1 else None
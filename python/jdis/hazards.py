@@ -0,0 +1,96 @@
+from collections import deque
+from .types import *
+from .constants import SCORING, FIREWALL_DAMAGE, MAP_SIZE
+
+# Estimated number of ticks the firewall takes to spread by one cell
+FIREWALL_TICKS_PER_CELL = 1
+
+# Projectiles are only considered for the first few ticks of a path since we
+# don't know their direction
+PROJECTILE_HORIZON = 2
+
+# Value of one HP expressed in ticks of travel
+HP_COST = 1
+
+NEVER = 1 << 30
+
+# The four cardinal and the four diagonal steps
+NEIGHBOURS_8 = [(0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+def firewall_eta(burning: bytearray, width: int = MAP_SIZE, height: int = MAP_SIZE) -> list[int]:
+    """
+    Tick at which the firewall is predicted to reach each cell: multi-source
+    BFS from every burning cell (one byte per cell, 1 = firewall seen there),
+    walls don't stop it
+    """
+    eta = [NEVER] * (width * height)
+    queue = deque()
+    i = burning.find(1)
+    while i != -1:
+        eta[i] = 0
+        queue.append(i)
+        i = burning.find(1, i + 1)
+
+    while queue:
+        i = queue.popleft()
+        x, y = i % width, i // width
+        t = eta[i] + FIREWALL_TICKS_PER_CELL
+        if y > 0 and eta[i - width] > t: eta[i - width] = t; queue.append(i - width)
+        if y < height - 1 and eta[i + width] > t: eta[i + width] = t; queue.append(i + width)
+        if x > 0 and eta[i - 1] > t: eta[i - 1] = t; queue.append(i - 1)
+        if x < width - 1 and eta[i + 1] > t: eta[i + 1] = t; queue.append(i + 1)
+    return eta
+
+class HazardMap:
+    """
+    Per-cell costs for the weighted search, built once per tick from the
+    game memory. Costs are expressed in ticks of travel.
+    """
+
+    def __init__(self, memory, fire_eta: list[int] = None, width: int = MAP_SIZE, height: int = MAP_SIZE):
+        self.width = width
+        self.height = height
+        size = width * height
+
+        # Static cost of stepping on a cell (traps)
+        self.cost = [0] * size
+        # Tick at which the firewall is predicted to reach each cell
+        if fire_eta is None:
+            fire_eta = firewall_eta(memory.burning, width, height)
+        self.fire_eta = fire_eta
+        # Damage of the projectiles that may reach each cell soon
+        self.danger = [0] * size
+
+        self._add_traps(memory)
+        self._add_projectiles(memory)
+
+    def _index(self, pos: Vector) -> int:
+        if 0 <= pos.x < self.width and 0 <= pos.y < self.height:
+            return pos.y * self.width + pos.x
+        return -1
+
+    def _add_traps(self, memory):
+        for pos, obj in memory.last_seen.items():
+            if isinstance(obj, ObjectTrap):
+                i = self._index(pos)
+                if i != -1:
+                    self.cost[i] += obj.damage * HP_COST - SCORING["step_on_trap"]
+
+    def _add_projectiles(self, memory):
+        """Mark every cell a projectile could reach next tick, in any direction"""
+        for projectile in memory.projectiles:
+            for dx, dy in NEIGHBOURS_8:
+                for k in range(max(1, projectile.speed) + 1):
+                    i = self._index(projectile.position + Vector(dx * k, dy * k))
+                    if i == -1:
+                        break
+                    self.danger[i] = max(self.danger[i], projectile.damage)
+
+    def entry_cost(self, i: int, tick: int) -> int:
+        """Cost of entering cell i on the given tick (1 tick + hazards)"""
+        cost = 1 + self.cost[i]
+        if self.fire_eta[i] <= tick:
+            cost += FIREWALL_DAMAGE * HP_COST
+        if tick <= PROJECTILE_HORIZON:
+            cost += self.danger[i] * HP_COST
+        return cost
@@ -0,0 +1,224 @@
+from collections import deque
+from heapq import heappush, heappop
+
+# Side of a square cluster, the 125x125 map gives 13x13 clusters
+CLUSTER_SIZE = 10
+
+# Border runs at least this long get an entrance at both ends
+LONG_ENTRANCE = 6
+
+class ClusterMap:
+    """
+    Hierarchical (HPA*) abstraction over a SearchGrid. The map is split in
+    square clusters; entrances are placed on walkable runs of the borders and
+    the distances between the entrances of a cluster are cached. A cluster is
+    only recomputed after one of its cells (or a cell on its border) changes.
+    """
+
+    def __init__(self, grid, cluster_size: int = CLUSTER_SIZE):
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.columns = (grid.width + cluster_size - 1) // cluster_size
+        self.rows = (grid.height + cluster_size - 1) // cluster_size
+        self.count = self.columns * self.rows
+
+        self.nodes = [[] for _ in range(self.count)]  # entrance cells per cluster
+        self.links = [[] for _ in range(self.count)]  # (cell, cell across the border)
+        self.graph = {}  # entrance cell -> [(entrance cell, distance)]
+        self.dirty = set(range(self.count))
+        self.rebuilds = 0
+        self.expanded = 0  # nodes expanded by the last abstract search
+        self._blank = None  # abstraction of the empty map, see prepare_blank
+
+    def cluster_of(self, i: int) -> int:
+        return (self.grid.ys[i] // self.cluster_size) * self.columns + self.grid.xs[i] // self.cluster_size
+
+    def bounds(self, c: int) -> tuple[int, int, int, int]:
+        """(x0, y0, x1, y1) of a cluster, upper bounds excluded"""
+        x0 = (c % self.columns) * self.cluster_size
+        y0 = (c // self.columns) * self.cluster_size
+        return x0, y0, min(x0 + self.cluster_size, self.grid.width), min(y0 + self.cluster_size, self.grid.height)
+
+    def invalidate(self, i: int):
+        """Mark the cluster of a changed cell dirty, and its neighbour if the cell is on a border"""
+        c = self.cluster_of(i)
+        self.dirty.add(c)
+        x, y = self.grid.xs[i], self.grid.ys[i]
+        size = self.cluster_size
+        cx, cy = c % self.columns, c // self.columns
+        if x % size == 0 and cx > 0: self.dirty.add(c - 1)
+        if x % size == size - 1 and cx < self.columns - 1: self.dirty.add(c + 1)
+        if y % size == 0 and cy > 0: self.dirty.add(c - self.columns)
+        if y % size == size - 1 and cy < self.rows - 1: self.dirty.add(c + self.columns)
+
+    def invalidate_all(self):
+        self.dirty = set(range(self.count))
+
+    def prepare_blank(self):
+        """Build the abstraction of the current (empty) grid once and keep it for reset"""
+        self.update()
+        self._blank = (list(self.nodes), list(self.links), dict(self.graph))
+
+    def reset(self):
+        """Back to the empty map, without rebuilding anything if prepare_blank was called"""
+        if self._blank is None:
+            self.invalidate_all()
+            return
+        nodes, links, graph = self._blank
+        self.nodes = list(nodes)
+        self.links = list(links)
+        self.graph = dict(graph)
+        self.dirty.clear()
+
+    def _border_pairs(self, c: int) -> list[list[tuple[int, int]]]:
+        """Cell pairs (inside, outside) along each of the 4 borders of a cluster"""
+        width = self.grid.width
+        x0, y0, x1, y1 = self.bounds(c)
+        borders = []
+        if y0 > 0:
+            borders.append([(y0 * width + x, (y0 - 1) * width + x) for x in range(x0, x1)])
+        if y1 < self.grid.height:
+            borders.append([((y1 - 1) * width + x, y1 * width + x) for x in range(x0, x1)])
+        if x0 > 0:
+            borders.append([(y * width + x0, y * width + x0 - 1) for y in range(y0, y1)])
+        if x1 < width:
+            borders.append([(y * width + x1 - 1, y * width + x1) for y in range(y0, y1)])
+        return borders
+
+    def _rebuild(self, c: int):
+        walkable = self.grid.walkable
+        nodes, links = [], []
+
+        # Entrances: one per walkable run of the border, two for long runs
+        for border in self._border_pairs(c):
+            run = []
+            for pair in border + [None]:
+                if pair is not None and walkable[pair[0]] and walkable[pair[1]]:
+                    run.append(pair)
+                    continue
+                if run:
+                    chosen = [run[0], run[-1]] if len(run) >= LONG_ENTRANCE else [run[len(run) // 2]]
+                    for inside, outside in chosen:
+                        links.append((inside, outside))
+                        if inside not in nodes:
+                            nodes.append(inside)
+                    run = []
+
+        for old in self.nodes[c]:
+            del self.graph[old]
+
+        # Intra-cluster distances between every pair of entrances, plus the
+        # unit edges crossing the borders
+        for node in nodes:
+            dist = self.local_distances(node, c)
+            self.graph[node] = [(other, dist[other]) for other in nodes if other != node and other in dist]
+        for inside, outside in links:
+            self.graph[inside].append((outside, 1))
+
+        self.nodes[c] = nodes
+        self.links[c] = links
+        self.rebuilds += 1
+
+    def update(self):
+        """Recompute every dirty cluster"""
+        for c in self.dirty:
+            self._rebuild(c)
+        self.dirty.clear()
+
+    def local_distances(self, start: int, c: int, parents: dict = None) -> dict[int, int]:
+        """BFS distances from start without leaving cluster c"""
+        grid = self.grid
+        walkable, neighbours, xs, ys = grid.walkable, grid.neighbours, grid.xs, grid.ys
+        x0, y0, x1, y1 = self.bounds(c)
+        dist = {start: 0}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            d = dist[node] + 1
+            for nb in neighbours[node]:
+                if nb not in dist and walkable[nb] and x0 <= xs[nb] < x1 and y0 <= ys[nb] < y1:
+                    dist[nb] = d
+                    if parents is not None:
+                        parents[nb] = node
+                    queue.append(nb)
+        return dist
+
+    def local_path(self, start: int, goal: int) -> list[int]:
+        """Shortest path between two cells of the same cluster, staying inside it"""
+        parents = {start: -1}
+        dist = self.local_distances(start, self.cluster_of(start), parents)
+        if goal not in dist:
+            return []
+        path = [goal]
+        while path[-1] != start:
+            path.append(parents[path[-1]])
+        path.reverse()
+        return path
+
+    def abstract_path(self, start: int, goal: int) -> list[int]:
+        """
+        A* over the entrance graph with start and goal temporarily inserted.
+        Returns the abstract nodes from start to goal, or [] if unreachable.
+        """
+        grid = self.grid
+        self.expanded = 0
+        if not grid.walkable[goal]:
+            return []
+        self.update()
+        xs, ys = grid.xs, grid.ys
+        start_cluster = self.cluster_of(start)
+        goal_cluster = self.cluster_of(goal)
+
+        start_edges = self.local_distances(start, start_cluster)
+        goal_edges = self.local_distances(goal, goal_cluster)
+        start_successors = [(n, start_edges[n]) for n in self.nodes[start_cluster] if n in start_edges and n != start]
+        start_successors += self.graph.get(start, [])
+        graph = self.graph
+
+        gx, gy = xs[goal], ys[goal]
+        g = {start: 0}
+        parent = {start: -1}
+        heap = [(abs(xs[start] - gx) + abs(ys[start] - gy), start)]
+        closed = set()
+
+        while heap:
+            _, node = heappop(heap)
+            if node == goal:
+                path = [goal]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                path.reverse()
+                return path
+            if node in closed:
+                continue
+            closed.add(node)
+            self.expanded += 1
+
+            successors = start_successors if node == start else graph[node]
+            if node in goal_edges:
+                successors = successors + [(goal, goal_edges[node])]
+
+            for nb, cost in successors:
+                if nb in closed:
+                    continue
+                ng = g[node] + cost
+                if ng < g.get(nb, 1 << 30):
+                    g[nb] = ng
+                    parent[nb] = node
+                    heappush(heap, (ng + abs(xs[nb] - gx) + abs(ys[nb] - gy), nb))
+        return []
+
+    def refine(self, abstract: list[int], steps: int) -> list[int]:
+        """Turn the first abstract hops into cells until at least `steps` cells are known"""
+        if not abstract:
+            return []
+        path = [abstract[0]]
+        for a, b in zip(abstract, abstract[1:]):
+            if len(path) > steps:
+                break
+            if self.cluster_of(a) == self.cluster_of(b):
+                segment = self.local_path(a, b)
+            else:
+                segment = [a, b]  # crossing a border
+            path.extend(segment[1:])
+        return path
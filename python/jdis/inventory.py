@@ -0,0 +1,89 @@
+from .types import *
+from .constants import ITEM_PRIORITY
+
+def item_priority(item) -> int:
+    """Priority of an item from ITEM_PRIORITY, 0 for unknown items"""
+    return ITEM_PRIORITY.get(item.name, 0)
+
+def placed_object(item: InventoryItemPlaced) -> str:
+    """Lowercase kind of object a placed item puts down ("wall", "trap"...)"""
+    obj = item.object
+    return str(obj.get("type", "") if isinstance(obj, dict) else obj).lower()
+
+def placed_pattern(item: InventoryItemPlaced) -> tuple[str, dict]:
+    """
+    Lowercase pattern name of a placed item and its parameters (width and
+    height of a rectangle, radius of a box) when the server sends them
+    """
+    pattern = item.pattern
+    if isinstance(pattern, dict):
+        return str(pattern.get("type", "")).lower(), pattern
+    return str(pattern).lower(), {}
+
+class InventoryIndex:
+    """
+    Inventory grouped by item type, built once per tick so strategies don't
+    scan the whole inventory (which has no size limit) for every query.
+    Items with a quantity of 0 and items still on cooldown (remaining_ticks
+    above 0) are left out, since they can't be used this tick.
+    """
+
+    def __init__(self, inventory: list):
+        self.buffs = []
+        self.projectiles = []
+        self.walls = []
+        self.traps = []
+        self.nukes = []
+        self.by_effect = {}  # BuffEffect -> buffs, best first
+
+        for item in inventory:
+            if item.quantity == 0 or item.remaining_ticks > 0:
+                continue
+            if isinstance(item, InventoryItemBuff):
+                self.buffs.append(item)
+                self.by_effect.setdefault(item.effect, []).append(item)
+            elif isinstance(item, InventoryItemProjectile):
+                self.projectiles.append(item)
+            elif isinstance(item, InventoryItemPlaced):
+                if "trap" in placed_object(item):
+                    self.traps.append(item)
+                else:
+                    self.walls.append(item)
+            elif isinstance(item, InventoryItemNuke):
+                self.nukes.append(item)
+
+        for group in self.by_effect.values():
+            group.sort(key=lambda i: (item_priority(i), i.power), reverse=True)
+        self.projectiles.sort(key=lambda i: (i.damage, i.range), reverse=True)
+        self.walls.sort(key=lambda i: (item_priority(i), i.range), reverse=True)
+        self.traps.sort(key=lambda i: (item_priority(i), i.range), reverse=True)
+
+        # Every usable item, highest ITEM_PRIORITY first
+        self.ranked = sorted(self.buffs + self.projectiles + self.walls + self.traps + self.nukes,
+                             key=item_priority, reverse=True)
+
+    @property
+    def nuke(self) -> InventoryItemNuke:
+        return self.nukes[0] if self.nukes else None
+
+    @property
+    def best_projectile(self) -> InventoryItemProjectile:
+        """Highest damage projectile, longest range on ties"""
+        return self.projectiles[0] if self.projectiles else None
+
+    @property
+    def best_wall(self) -> InventoryItemPlaced:
+        return self.walls[0] if self.walls else None
+
+    @property
+    def best_trap(self) -> InventoryItemPlaced:
+        return self.traps[0] if self.traps else None
+
+    def best_buff(self, *effects) -> InventoryItemBuff:
+        """Best buff having one of the given effects"""
+        best = None
+        for effect in effects:
+            group = self.by_effect.get(effect)
+            if group and (best is None or (item_priority(group[0]), group[0].power) > (item_priority(best), best.power)):
+                best = group[0]
+        return best
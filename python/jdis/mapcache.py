@@ -0,0 +1,116 @@
+import hashlib
+import mmap
+import os
+from .types import *
+from .constants import MAP_SIZE
+from .pathfinding import CELL_CODES, UNKNOWN, FIREWALL
+
+# Number of ticks observed before deciding whether the map is already known
+MATCH_TICKS = 3
+
+# Minimum number of observed cells that must agree with a stored layout
+MIN_MATCHING_CELLS = 60
+
+LAYOUT_SIZE = MAP_SIZE * MAP_SIZE
+
+class MapCache:
+    """
+    Optional on-disk cache of arena layouts, one MAP_SIZE x MAP_SIZE file of
+    cell codes per map. Enabled by setting the JDIS_MAP_CACHE environment
+    variable to a folder. The first patches seen in a game are compared with
+    every stored layout; on a match the layout is memory-mapped and handed to
+    the memory, which keeps it as tentative until the cells are seen again.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.start_game()
+
+    @staticmethod
+    def from_env():
+        directory = os.getenv("JDIS_MAP_CACHE")
+        return MapCache(directory) if directory else None
+
+    def start_game(self):
+        self.patches = []  # (offset, width, height, codes) of the first ticks
+        self.decided = False
+        self.path = None
+        self.layout = None
+
+    def _codes(self, ground: Ground) -> bytes:
+        return bytes(CELL_CODES.get(cell, UNKNOWN) for cell in ground.data)
+
+    def _matches(self, layout) -> bool:
+        agreeing = 0
+        for offset, width, height, codes in self.patches:
+            for y in range(height):
+                gy = offset.y + y
+                if not 0 <= gy < MAP_SIZE:
+                    continue
+                for x in range(width):
+                    gx = offset.x + x
+                    if not 0 <= gx < MAP_SIZE:
+                        continue
+                    stored = layout[gy * MAP_SIZE + gx]
+                    seen = codes[y * width + x]
+                    if stored == UNKNOWN or seen == FIREWALL:
+                        continue
+                    if stored != seen:
+                        return False
+                    agreeing += 1
+        return agreeing >= MIN_MATCHING_CELLS
+
+    def observe(self, state: GameState):
+        """
+        Feed the first ticks of a game. Returns the memory-mapped stored
+        layout once a match is found, None otherwise.
+        """
+        if self.decided:
+            return None
+        ground = state.ground
+        self.patches.append((ground.offset, ground.width, ground.height, self._codes(ground)))
+        if len(self.patches) < MATCH_TICKS:
+            return None
+        self.decided = True
+
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".map"):
+                continue
+            path = os.path.join(self.directory, name)
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size != LAYOUT_SIZE:
+                    continue
+                layout = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._matches(layout):
+                print(f"Map cache: layout {name} matches this game")
+                self.path = path
+                self.layout = layout
+                return layout
+            layout.close()
+
+        # New map: name it after the first patch and where it was seen
+        offset, _, _, codes = self.patches[0]
+        digest = hashlib.sha1(codes + f"{offset.x},{offset.y}".encode()).hexdigest()[:16]
+        self.path = os.path.join(self.directory, f"{digest}.map")
+        print(f"Map cache: new map {digest}")
+        return None
+
+    def save(self, known_map: dict):
+        """Merge the cells learned this game into the stored layout, in one write"""
+        if self.path is None:
+            return
+        layout = bytearray(self.layout[:]) if self.layout is not None else bytearray(LAYOUT_SIZE)
+        for pos, cell in known_map.items():
+            if cell != Cell.firewall and 0 <= pos.x < MAP_SIZE and 0 <= pos.y < MAP_SIZE:
+                layout[pos.y * MAP_SIZE + pos.x] = CELL_CODES.get(cell, UNKNOWN)
+        if self.layout is not None:
+            self.layout.close()
+            self.layout = None
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(layout)
+        os.replace(tmp, self.path)
+        print(f"Map cache: saved {os.path.basename(self.path)}")
+        self.path = None
@@ -1,22 +1,67 @@
-from .pathfinding import Pathfinder
+from .pathfinding import Pathfinder, CELL_CODES, UNKNOWN
+from .hazards import HazardMap, firewall_eta
+from .speculation import Speculator
+from .inventory import InventoryIndex
+from .aiming import RayTable, Aimer
+from .routing import ChestRoutePlanner
+from .reach import EnemyReach, ENEMY_MEMORY_TICKS
+from .placement import PlacementPlanner
+from .exploration import ExplorationScorer
+from .mapcache import MapCache
+from .constants import MAP_SIZE
 from .types import *
 from collections import defaultdict
+import sys
+
+# Hard caps of the structures that grow during a game, see _enforce_caps
+MAX_FRONTIER = 2048
+MAX_LAST_SEEN = 1024
+MAX_FIREWALL_POSITIONS = 4096
+
+# Ticks to wait for a chest open to be confirmed before trying it again
+PENDING_CHEST_TICKS = 3
+
+# Translation table: 1 for every known cell code
+KNOWN_BY_CODE = bytes(0 if code == UNKNOWN else 1 for code in range(256))
 
 class GameMemory:
     """Complete game state memory with all tracking features"""
     
     def __init__(self):
+        # Structures kept for the whole process, reset() only clears them
+        self.map_cache = MapCache.from_env()
+        self.pathfinder = Pathfinder()  # the search grid and clusters
+        self.rays = RayTable()
+        self.explorer = ExplorationScorer()
+        self.speculator = Speculator(self)
+        self.tick = 0
         self.reset()
     
     def reset(self):
         """Reset all memory at game start"""
         print("Resetting game memory...")
+        # Keep what was learned about the previous map, if caching is enabled
+        self.save_map()
+
         # Core tracking
         self.known_map = {}  # position -> Cell type
         self.opened_chests = set()
-        self.firewall_positions = set()
+        self.pending_chests = {}  # chest position -> tick the open was sent
+        self._item_count = 0
+        self.firewall_positions = set()  # burning cells, pruned to the border (see _enforce_caps)
+        self.burning = bytearray(MAP_SIZE * MAP_SIZE)  # every cell seen burning, seeds the fire eta
+        self.burning_count = 0
         self.firewall_pattern = None
         self.last_seen = {}  # positions of objects/enemies
+        self.enemy_sightings = {}  # enemy name -> (last position, tick)
+        self.tentative = bytearray(MAP_SIZE * MAP_SIZE)  # 1 = from the map cache, not seen yet
+        self.tentative_chests = set()
+        self.projectiles = []
+        self.inventory = InventoryIndex([])
+        self.tick = 0
+        self.evicted = defaultdict(int)  # structure -> entries dropped by _enforce_caps
+        self._hazards = None
+        self._hazards_tick = -1
         
         # Exploration system
         self.exploration_frontier = set()
@@ -28,13 +73,43 @@ class GameMemory:
         }
         
         # Navigation
-        self.pathfinder = Pathfinder()
+        self.pathfinder.clear()
+        self.pathfinder.owner = self
         self.last_player_position = None
 
+        # Line-of-fire rays and shot selection
+        self.rays.reset()
+        self.aimer = Aimer(self.rays)
+        self.placer = PlacementPlanner()
+
+        # Unknown cells, to explore where the view uncovers the most
+        self.explorer.reset()
+        self._explore_target = None
+        self._explore_tick = -1
+
+        # Chest route, planned at most once per tick
+        self.route_planner = ChestRoutePlanner(self.pathfinder)
+        self._chest_route = []
+        self._chest_route_tick = -1
+
+        # Per-tick caches, possibly filled from the speculation
+        self.speculator.cancel()
+        self._speculation = None
+        self._distances = None
+        self._distances_tick = -1
+        self._fire_eta = None
+        self._fire_count = -1
+        self._reach = None
+        self._reach_tick = -1
+        if self.map_cache is not None:
+            self.map_cache.start_game()
+
     def update(self, state: GameState):
         """Update all memory with current game state"""
         print(f"\n=== MEMORY UPDATE ===")
         
+        self.tick += 1
+
         # Track player position
         self.last_player_position = state.player.position
         print(f"Player at {state.player.position.x},{state.player.position.y}")
@@ -48,39 +123,197 @@ class GameMemory:
                 
                 if pos not in self.known_map:
                     new_cells += 1
+                    self.explorer.reveal(pos)
                     # Add adjacent cells to exploration frontier
                     for dx, dy in [(0,1),(1,0),(0,-1),(-1,0)]:
                         neighbor = pos + Vector(dx, dy)
                         if neighbor not in self.known_map:
                             self.exploration_frontier.add(neighbor)
                 
+                if self.known_map.get(pos) != cell_type:
+                    self.pathfinder.update_cell(pos, cell_type)
+                    self.rays.update_cell(pos, cell_type)
+                    if 0 <= pos.x < MAP_SIZE and 0 <= pos.y < MAP_SIZE:
+                        self.tentative[pos.y * MAP_SIZE + pos.x] = 0
+                    if cell_type != Cell.chest:
+                        self.tentative_chests.discard(pos)
                 self.known_map[pos] = cell_type
+                self.exploration_frontier.discard(pos)
                 
                 # Track special cells
                 if cell_type == Cell.firewall:
                     self.firewall_positions.add(pos)
+                    if 0 <= pos.x < MAP_SIZE and 0 <= pos.y < MAP_SIZE and not self.burning[pos.y * MAP_SIZE + pos.x]:
+                        self.burning[pos.y * MAP_SIZE + pos.x] = 1
+                        self.burning_count += 1
                 elif cell_type == Cell.groundPlane:
                     self._update_boundaries(pos)
         
         print(f"Added {new_cells} new cells to memory")
 
+        # Recognise a map seen in a previous game
+        if self.map_cache is not None:
+            layout = self.map_cache.observe(state)
+            if layout is not None:
+                self._load_layout(layout)
+
         # Track objects
+        # (re-inserted so last_seen stays ordered from least to most recent)
         for obj in state.objects:
+            self.last_seen.pop(obj.position, None)
             self.last_seen[obj.position] = obj
             if isinstance(obj, ObjectChest):
                 print(f"Chest at {obj.position.x},{obj.position.y}")
             elif isinstance(obj, ObjectTrap):
                 print(f"Trap at {obj.position.x},{obj.position.y} (owner: {obj.owner})")
 
+        self.projectiles = state.projectiles
+        self.inventory = InventoryIndex(state.player.inventory)
+        self._confirm_opened_chests(state)
+
         # Track enemies
         for enemy in state.enemies:
+            self.last_seen.pop(enemy.position, None)
             self.last_seen[enemy.position] = enemy
+            self.enemy_sightings[enemy.name] = (enemy.position, self.tick)
             print(f"Enemy {enemy.name} at {enemy.position.x},{enemy.position.y} (HP: {enemy.hp})")
 
+        for name, (_, seen) in list(self.enemy_sightings.items()):
+            if self.tick - seen > ENEMY_MEMORY_TICKS:
+                del self.enemy_sightings[name]
+
         # Update firewall pattern detection
         if not self.firewall_pattern:
             self._detect_firewall_pattern()
 
+        # Pick up what was precomputed while waiting for this tick
+        self._speculation = self.speculator.lookup(self.last_player_position)
+        print(self.speculator.report())
+
+        self._enforce_caps()
+        print("Memory: " + ", ".join(f"{name} {count} ({size // 1024}KB)"
+                                     for name, (count, size) in self.footprint().items()))
+
+    def _enforce_caps(self):
+        """Keep the growing structures under their cap, evicting what matters least"""
+        # Farthest frontier cells from the player
+        if len(self.exploration_frontier) > MAX_FRONTIER:
+            player = self.last_player_position
+            kept = sorted(self.exploration_frontier, key=lambda p: abs(p.x - player.x) + abs(p.y - player.y))
+            self.evicted["exploration_frontier"] += len(kept) - MAX_FRONTIER * 3 // 4
+            self.exploration_frontier = set(kept[:MAX_FRONTIER * 3 // 4])
+
+        # Objects and enemies not seen for the longest time
+        if len(self.last_seen) > MAX_LAST_SEEN:
+            oldest = list(self.last_seen)[:len(self.last_seen) - MAX_LAST_SEEN * 3 // 4]
+            for pos in oldest:
+                del self.last_seen[pos]
+            self.evicted["last_seen"] += len(oldest)
+
+        # Firewall cells surrounded by firewall, then the farthest ones: the
+        # set is only used to measure distances from the player (the fire eta
+        # is seeded from the burning bitmap)
+        if len(self.firewall_positions) > MAX_FIREWALL_POSITIONS:
+            # Neighbours checked on flat indices of the burning bitmap, this
+            # runs over thousands of cells
+            burning, size = self.burning, MAP_SIZE
+            last = size - 1
+            border = []
+            for p in self.firewall_positions:
+                x, y = p.x, p.y
+                if not (0 <= x < size and 0 <= y < size):
+                    continue
+                i = y * size + x
+                if ((x > 0 and not burning[i - 1]) or (x < last and not burning[i + 1])
+                        or (y > 0 and not burning[i - size]) or (y < last and not burning[i + size])):
+                    border.append(p)
+            if len(border) > MAX_FIREWALL_POSITIONS * 3 // 4:
+                player = self.last_player_position
+                px, py = player.x, player.y
+                border.sort(key=lambda p: abs(p.x - px) + abs(p.y - py))
+                border = border[:MAX_FIREWALL_POSITIONS * 3 // 4]
+            self.evicted["firewall_positions"] += len(self.firewall_positions) - len(border)
+            self.firewall_positions = set(border)
+
+    def footprint(self) -> dict:
+        """Structure -> (entries, approximate bytes), sampling one entry per container"""
+        def size(container, entry_size):
+            return len(container), sys.getsizeof(container) + len(container) * entry_size
+
+        def sample(container):
+            if not container:
+                return 0
+            entry = next(iter(container))
+            if isinstance(container, dict):
+                return sys.getsizeof(entry) + sys.getsizeof(container[entry])
+            return sys.getsizeof(entry)
+
+        fields = self.route_planner.fields
+        return {
+            "known_map": size(self.known_map, sample(self.known_map)),
+            "exploration_frontier": size(self.exploration_frontier, sample(self.exploration_frontier)),
+            "last_seen": size(self.last_seen, sample(self.last_seen)),
+            "firewall_positions": size(self.firewall_positions, sample(self.firewall_positions)),
+            "enemy_sightings": size(self.enemy_sightings, sample(self.enemy_sightings)),
+            "opened_chests": size(self.opened_chests, sample(self.opened_chests)),
+            "tentative_chests": size(self.tentative_chests, sample(self.tentative_chests)),
+            "route_fields": size(fields, sys.getsizeof(next(iter(fields.values()))) if fields else 0),
+        }
+
+    def _confirm_opened_chests(self, state: GameState):
+        """
+        A chest we tried to open is opened once it's gone from view, or once the
+        inventory grew while it was the only open waiting (items also come
+        from kills, which can't be told apart)
+        """
+        items = sum(item.quantity for item in state.player.inventory)
+        gained = items > self._item_count and len(self.pending_chests) == 1
+        self._item_count = items
+        if not self.pending_chests:
+            return
+
+        ground = state.ground
+        visible = {obj.position for obj in state.objects if isinstance(obj, ObjectChest)}
+        for pos, sent in list(self.pending_chests.items()):
+            x, y = pos.x - ground.offset.x, pos.y - ground.offset.y
+            in_view = 0 <= x < ground.width and 0 <= y < ground.height
+            gone = in_view and pos not in visible and ground.data[y * ground.width + x] != Cell.chest
+            if gone or gained:
+                print(f"Chest at {pos.x},{pos.y} opened")
+                self.opened_chests.add(pos)
+                del self.pending_chests[pos]
+            elif self.tick - sent > PENDING_CHEST_TICKS:
+                del self.pending_chests[pos]  # the open failed, the route will try again
+
+    def _load_layout(self, layout):
+        """Start from a cached layout, the cells seen this game take precedence"""
+        layout = layout[:]  # one read of the mapped file
+        self.pathfinder.load_layout(layout)
+        self.tentative[:] = layout.translate(KNOWN_BY_CODE)
+        for pos, cell in self.known_map.items():
+            self.pathfinder.update_cell(pos, cell)
+            if 0 <= pos.x < MAP_SIZE and 0 <= pos.y < MAP_SIZE:
+                self.tentative[pos.y * MAP_SIZE + pos.x] = 0
+
+        for cell, targets in ((Cell.resistance, None), (Cell.chest, self.tentative_chests)):
+            code = CELL_CODES[cell]
+            i = layout.find(bytes((code,)))
+            while i != -1:
+                if self.tentative[i]:
+                    pos = Vector(i % MAP_SIZE, i // MAP_SIZE)
+                    if targets is None:
+                        self.rays.update_cell(pos, cell)
+                    else:
+                        targets.add(pos)
+                i = layout.find(bytes((code,)), i + 1)
+        self.explorer.reveal_all(self.tentative)
+        print(f"Loaded {sum(self.tentative)} cells and {len(self.tentative_chests)} chests from the map cache")
+
+    def save_map(self):
+        """Store this game's map in the cache (once per game)"""
+        if self.map_cache is not None and self.tick > 0:
+            self.map_cache.save(self.known_map)
+
     def _update_boundaries(self, pos: Vector):
         """Track map boundaries based on groundPlane cells"""
         self.map_boundaries['min_x'] = min(self.map_boundaries['min_x'], pos.x)
@@ -106,6 +339,54 @@ class GameMemory:
             self.firewall_pattern = "random"
         print(f"Firewall pattern detected: {self.firewall_pattern}")
 
+    def get_hazards(self) -> HazardMap:
+        """Costs of traps, firewall and projectiles, built once per tick"""
+        if self._hazards_tick != self.tick:
+            self._hazards = HazardMap(self, self.get_fire_eta())
+            self._hazards_tick = self.tick
+        return self._hazards
+
+    def get_fire_eta(self) -> list[int]:
+        """Predicted firewall arrival tick of every cell"""
+        if self._fire_count != self.burning_count:
+            speculation = self._speculation
+            if speculation is not None and speculation.fire_eta is not None:
+                self._fire_eta = speculation.fire_eta
+            else:
+                self._fire_eta = firewall_eta(self.burning)
+            self._fire_count = self.burning_count
+        return self._fire_eta
+
+    def get_distance_field(self) -> list[int]:
+        """Walking distance from the player to every cell (-1 if unreachable)"""
+        if self._distances_tick != self.tick:
+            speculation = self._speculation
+            if speculation is not None and speculation.distances is not None:
+                self._distances = speculation.distances
+            else:
+                grid = self.pathfinder.grid
+                self._distances = grid.distance_field(grid.index(self.last_player_position))
+            self._distances_tick = self.tick
+        return self._distances
+
+    def get_enemy_reach(self) -> EnemyReach:
+        """Earliest enemy arrival and line of fire of every cell, built once per tick"""
+        if self._reach_tick != self.tick:
+            speculation = self._speculation
+            if speculation is not None and speculation.reach is not None:
+                self._reach = speculation.reach
+            else:
+                self._reach = EnemyReach(self)
+            self._reach_tick = self.tick
+        return self._reach
+
+    def get_chest_route(self) -> list[Vector]:
+        """Known unopened chests in the order they should be opened"""
+        if self._chest_route_tick != self.tick:
+            self._chest_route = self.route_planner.plan(self)
+            self._chest_route_tick = self.tick
+        return self._chest_route
+
     def is_chest_unopened(self, position: Vector) -> bool:
         """Check if chest hasn't been opened"""
         return position not in self.opened_chests
@@ -118,15 +399,14 @@ class GameMemory:
         """Check if position is pathable"""
         if not self.last_player_position:
             return False
-        path = self.pathfinder.find_path(self.last_player_position, position, self)
-        return len(path) > 0
+        return self.pathfinder.is_reachable(self.last_player_position, position, self)
 
     def get_direction_toward(self, target: Vector) -> Vector:
         """Get movement vector toward target"""
         if not self.last_player_position:
             return Vector(0, 0)
-        path = self.pathfinder.find_path(self.last_player_position, target, self)
-        return path[1] - self.last_player_position if len(path) > 1 else Vector(0, 0)
+        next_step = self.pathfinder.get_next_move(self.last_player_position, target, self)
+        return next_step - self.last_player_position if next_step else Vector(0, 0)
 
     def get_safest_direction(self) -> Vector:
         """Get direction away from closest firewall"""
@@ -149,13 +429,37 @@ class GameMemory:
 
     def get_next_explore_position(self) -> Vector:
         """Get optimal exploration target"""
-        # 1. Check frontier for reachable positions
-        for pos in sorted(self.exploration_frontier,
-                        key=lambda p: abs(p.x-self.last_player_position.x) + abs(p.y-self.last_player_position.y)):
-            if self.is_position_reachable(pos):
-                return pos
+        # 1. Most unknown cells uncovered per step
+        if self._explore_tick != self.tick:
+            speculation = self._speculation
+            if speculation is not None and speculation.explored:
+                self._explore_target = speculation.explore_target
+            else:
+                self._explore_target = self.explorer.best_target(self)
+            self._explore_tick = self.tick
+        if self._explore_target is not None:
+            return self._explore_target
+
+        # 2. Closest reachable frontier cell, using the distance field,
+        #    preferring cells no enemy can reach first
+        distances = self.get_distance_field()
+        reach = self.get_enemy_reach()
+        grid = self.pathfinder.grid
+        best, best_key = None, None
+        for pos in self.exploration_frontier:
+            i = grid.index(pos)
+            if i == -1 or pos in self.known_map:
+                continue
+            d = distances[i]
+            if d <= 0:
+                continue
+            key = (reach.margin(i) <= 0 or reach.line_of_fire[i], d)
+            if best_key is None or key < best_key:
+                best, best_key = pos, key
+        if best is not None:
+            return best
         
-        # 2. Fallback to map center if no frontier
+        # 3. Fallback to map center if no frontier
         center_x = (self.map_boundaries['min_x'] + self.map_boundaries['max_x']) // 2
         center_y = (self.map_boundaries['min_y'] + self.map_boundaries['max_y']) // 2
         return Vector(center_x, center_y)
\ No newline at end of file
@@ -1,55 +1,614 @@
-from pathfinding.core.diagonal_movement import DiagonalMovement
-from pathfinding.core.grid import Grid
-from pathfinding.finder.a_star import AStarFinder
+from collections import deque
+from heapq import heappush, heappop
 from .types import *
+from .constants import MAP_SIZE
+from .hierarchy import ClusterMap
+
+# Cells the bot can't walk through
+BLOCKING_CELLS = (Cell.firewall, Cell.via, Cell.resistance)
+
+# Cells a phase can cross (vias are holes, nothing goes through them)
+PHASEABLE_CELLS = (Cell.resistance,)
+
+# Compact cell codes for the flat grid, 0 is reserved for unknown cells
+UNKNOWN = 0
+CELL_CODES = {cell: code for code, cell in enumerate(
+    [Cell.groundPlane, Cell.firewall, Cell.via, Cell.chest, Cell.resistance, Cell.pcb], start=1)}
+FIREWALL = CELL_CODES[Cell.firewall]
+CODE_CELLS = {code: cell for cell, code in CELL_CODES.items()}
+
+# Per-code lookup tables, to convert whole layouts at once with bytes.translate
+WALKABLE_BY_CODE = bytes(0 if CODE_CELLS.get(code) in BLOCKING_CELLS else 1 for code in range(256))
+PHASEABLE_BY_CODE = bytes(1 if CODE_CELLS.get(code) in PHASEABLE_CELLS else 0 for code in range(256))
+
+# Targets at least this far away go through the hierarchical search, which
+# only refines the first REFINE_STEPS cells of the path
+LONG_RANGE = 30
+REFINE_STEPS = 8
+
+# Number of walkability changes kept for consumers of Pathfinder.changed_since
+CHANGELOG_SIZE = 4096
+
+# Index into CARDINALS is the direction of a phase edge
+CARDINALS = (CardinalDirection.up, CardinalDirection.down, CardinalDirection.left, CardinalDirection.right)
+
+class SearchGrid:
+    """
+    Flat-array search engine for the 4-connected map. A cell is stored at
+    index y * width + x. The per-search arrays are stamped with a generation
+    number so nothing has to be cleared between two searches.
+    """
+
+    def __init__(self, width: int = MAP_SIZE, height: int = MAP_SIZE):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.xs = [i % width for i in range(self.size)]
+        self.ys = [i // width for i in range(self.size)]
+        self.neighbours = [self._build_neighbours(i) for i in range(self.size)]
+
+        # 1 = walkable, 0 = blocked
+        self.walkable = bytearray(b"\x01") * self.size
+        # Cell codes (see CELL_CODES) and 1 where a phase can cross
+        self.cells = bytearray(self.size)
+        self.phaseable = bytearray(self.size)
+
+        # Per-search state, valid only where the stamp matches the generation
+        self.generation = 0
+        self.expanded = 0  # nodes expanded by the last search
+        self.seen = [0] * self.size
+        self.closed = [0] * self.size
+        self.g = [0] * self.size
+        self.parent = [-1] * self.size
+
+    def _build_neighbours(self, i: int) -> tuple:
+        x, y = i % self.width, i // self.width
+        result = []
+        if y > 0: result.append(i - self.width)
+        if y < self.height - 1: result.append(i + self.width)
+        if x > 0: result.append(i - 1)
+        if x < self.width - 1: result.append(i + 1)
+        return tuple(result)
+
+    def index(self, pos: Vector) -> int:
+        """Flat index of a position, or -1 if outside the grid"""
+        if 0 <= pos.x < self.width and 0 <= pos.y < self.height:
+            return pos.y * self.width + pos.x
+        return -1
+
+    def position(self, i: int) -> Vector:
+        return Vector(self.xs[i], self.ys[i])
+
+    def set_walkable(self, i: int, walkable: bool):
+        self.walkable[i] = 1 if walkable else 0
+
+    def set_cell(self, i: int, cell: Cell):
+        self.cells[i] = CELL_CODES.get(cell, UNKNOWN)
+        self.walkable[i] = 0 if cell in BLOCKING_CELLS else 1
+        self.phaseable[i] = 1 if cell in PHASEABLE_CELLS else 0
+
+    def clear(self):
+        """Forget every cell, unknown cells are walkable"""
+        self.walkable[:] = b"\x01" * self.size
+        self.cells[:] = bytes(self.size)
+        self.phaseable[:] = bytes(self.size)
+
+    def load_cells(self, codes: bytes):
+        """Replace the whole grid with a layout of cell codes"""
+        self.cells[:] = codes
+        self.walkable[:] = codes.translate(WALKABLE_BY_CODE)
+        self.phaseable[:] = codes.translate(PHASEABLE_BY_CODE)
+
+    def _next_generation(self) -> int:
+        self.generation += 1
+        return self.generation
+
+    def _reconstruct(self, goal: int) -> list[int]:
+        path = []
+        node = goal
+        while node != -1:
+            path.append(node)
+            node = self.parent[node]
+        path.reverse()
+        return path
+
+    def astar(self, start: int, goal: int) -> list[int]:
+        """A* with a Manhattan heuristic. Returns the cells from start to goal"""
+        self.expanded = 0
+        if not self.walkable[goal]:
+            return []
+        gen = self._next_generation()
+        seen, closed, g, parent = self.seen, self.closed, self.g, self.parent
+        walkable, neighbours, xs, ys = self.walkable, self.neighbours, self.xs, self.ys
+        gx, gy = xs[goal], ys[goal]
+
+        seen[start] = gen
+        g[start] = 0
+        parent[start] = -1
+        h = abs(xs[start] - gx) + abs(ys[start] - gy)
+        heap = [(h, h, start)]
+
+        while heap:
+            _, _, node = heappop(heap)
+            if node == goal:
+                return self._reconstruct(goal)
+            if closed[node] == gen:
+                continue
+            closed[node] = gen
+            self.expanded += 1
+            cost = g[node] + 1
+            for nb in neighbours[node]:
+                if not walkable[nb] or closed[nb] == gen:
+                    continue
+                if seen[nb] != gen or cost < g[nb]:
+                    seen[nb] = gen
+                    g[nb] = cost
+                    parent[nb] = node
+                    h = abs(xs[nb] - gx) + abs(ys[nb] - gy)
+                    heappush(heap, (cost + h, h, nb))
+        return []
+
+    def bfs(self, start: int, goal: int) -> list[int]:
+        """Breadth-first search. Returns the cells from start to goal"""
+        self.expanded = 0
+        if not self.walkable[goal]:
+            return []
+        gen = self._next_generation()
+        seen, parent = self.seen, self.parent
+        walkable, neighbours = self.walkable, self.neighbours
+
+        seen[start] = gen
+        parent[start] = -1
+        queue = deque([start])
+
+        while queue:
+            node = queue.popleft()
+            self.expanded += 1
+            if node == goal:
+                return self._reconstruct(goal)
+            for nb in neighbours[node]:
+                if walkable[nb] and seen[nb] != gen:
+                    seen[nb] = gen
+                    parent[nb] = node
+                    queue.append(nb)
+        return []
+
+    def distance_field(self, start: int) -> list[int]:
+        """BFS distance from start to every cell, -1 where unreachable"""
+        dist = [-1] * self.size
+        walkable, neighbours = self.walkable, self.neighbours
+        dist[start] = 0
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            d = dist[node] + 1
+            for nb in neighbours[node]:
+                if walkable[nb] and dist[nb] == -1:
+                    dist[nb] = d
+                    queue.append(nb)
+        return dist
+
+    def repair_field(self, field: list[int], changed: list[int]):
+        """
+        Update a distance_field in place after the walkability of some cells
+        changed, touching only the cells whose distance actually changes.
+        """
+        walkable, neighbours = self.walkable, self.neighbours
+
+        # New walls: find every cell whose shortest paths all went through
+        # one of them, then recompute those from the unaffected cells around
+        affected = set(i for i in changed if not walkable[i] and field[i] > 0)
+        queue = deque(affected)
+        while queue:
+            u = queue.popleft()
+            du = field[u]
+            for v in neighbours[u]:
+                if v in affected or field[v] != du + 1 or not walkable[v]:
+                    continue
+                supported = False
+                for w in neighbours[v]:
+                    if field[w] == du and walkable[w] and w not in affected:
+                        supported = True
+                        break
+                if not supported:
+                    affected.add(v)
+                    queue.append(v)
+
+        heap = []
+        for v in affected:
+            field[v] = -1
+        for v in affected:
+            if not walkable[v]:
+                continue
+            best = -1
+            for w in neighbours[v]:
+                if field[w] >= 0 and walkable[w] and (best == -1 or field[w] + 1 < best):
+                    best = field[w] + 1
+            if best != -1:
+                field[v] = best
+                heappush(heap, (best, v))
+
+        # New openings: they can only shorten distances
+        for c in changed:
+            if not walkable[c]:
+                continue
+            best = field[c]
+            for w in neighbours[c]:
+                if field[w] >= 0 and walkable[w] and (best == -1 or field[w] + 1 < best):
+                    best = field[w] + 1
+            if best != field[c]:
+                field[c] = best
+                heappush(heap, (best, c))
+
+        while heap:
+            d, u = heappop(heap)
+            if d != field[u]:
+                continue
+            for v in neighbours[u]:
+                if walkable[v] and (field[v] == -1 or field[v] > d + 1):
+                    field[v] = d + 1
+                    heappush(heap, (d + 1, v))
+
+    # Jump Point Search for 4-connected grids. Canonical paths go horizontally
+    # first and may turn vertical anywhere; a vertical run only turns back
+    # horizontal at a forced neighbour (the side cell of the previous row is
+    # blocked but the side cell of the current row is open).
+
+    def _jump_vertical(self, node: int, step: int, goal: int) -> int:
+        walkable, xs = self.walkable, self.xs
+        x = xs[node]
+        has_left = x > 0
+        has_right = x < self.width - 1
+        while True:
+            nxt = node + step
+            if nxt < 0 or nxt >= self.size or not walkable[nxt]:
+                return -1
+            if nxt == goal:
+                return nxt
+            if has_left and walkable[nxt - 1] and not walkable[node - 1]:
+                return nxt
+            if has_right and walkable[nxt + 1] and not walkable[node + 1]:
+                return nxt
+            node = nxt
+
+    def _jump_horizontal(self, node: int, step: int, goal: int) -> int:
+        walkable, xs = self.walkable, self.xs
+        width = self.width
+        while True:
+            x = xs[node] + step
+            if x < 0 or x >= width:
+                return -1
+            nxt = node + step
+            if not walkable[nxt]:
+                return -1
+            if nxt == goal:
+                return nxt
+            if self._jump_vertical(nxt, -width, goal) != -1 or self._jump_vertical(nxt, width, goal) != -1:
+                return nxt
+            node = nxt
+
+    def _jump_successors(self, node: int, goal: int) -> list[int]:
+        width = self.width
+        walkable, xs = self.walkable, self.xs
+        parent = self.parent[node]
+        result = []
+
+        if parent == -1:
+            horizontal = (-1, 1)
+            vertical = (-width, width)
+        elif self.ys[parent] == self.ys[node]:
+            horizontal = (1 if node > parent else -1,)
+            vertical = (-width, width)
+        else:
+            step = width if node > parent else -width
+            vertical = (step,)
+            prev = node - step
+            x = xs[node]
+            horizontal = []
+            if x > 0 and walkable[node - 1] and not walkable[prev - 1]:
+                horizontal.append(-1)
+            if x < width - 1 and walkable[node + 1] and not walkable[prev + 1]:
+                horizontal.append(1)
+
+        for step in horizontal:
+            jp = self._jump_horizontal(node, step, goal)
+            if jp != -1:
+                result.append(jp)
+        for step in vertical:
+            jp = self._jump_vertical(node, step, goal)
+            if jp != -1:
+                result.append(jp)
+        return result
+
+    def jps(self, start: int, goal: int) -> list[int]:
+        """Jump Point Search. Returns every cell from start to goal"""
+        self.expanded = 0
+        if not self.walkable[goal]:
+            return []
+        gen = self._next_generation()
+        seen, closed, g, parent = self.seen, self.closed, self.g, self.parent
+        xs, ys = self.xs, self.ys
+        gx, gy = xs[goal], ys[goal]
+
+        seen[start] = gen
+        g[start] = 0
+        parent[start] = -1
+        h = abs(xs[start] - gx) + abs(ys[start] - gy)
+        heap = [(h, h, start)]
+
+        while heap:
+            _, _, node = heappop(heap)
+            if node == goal:
+                return self._expand(self._reconstruct(goal))
+            if closed[node] == gen:
+                continue
+            closed[node] = gen
+            self.expanded += 1
+            nx, ny = xs[node], ys[node]
+            for jp in self._jump_successors(node, goal):
+                if closed[jp] == gen:
+                    continue
+                cost = g[node] + abs(xs[jp] - nx) + abs(ys[jp] - ny)
+                if seen[jp] != gen or cost < g[jp]:
+                    seen[jp] = gen
+                    g[jp] = cost
+                    parent[jp] = node
+                    h = abs(xs[jp] - gx) + abs(ys[jp] - gy)
+                    heappush(heap, (cost + h, h, jp))
+        return []
+
+    def phase_landing(self, node: int, d: int) -> int:
+        """Cell reached by phasing from node in CARDINALS[d], or -1"""
+        x, y = self.xs[node], self.ys[node]
+        step = CARDINALS[d]
+        x += step.x
+        y += step.y
+        crossed = False
+        while 0 <= x < self.width and 0 <= y < self.height:
+            i = y * self.width + x
+            if not self.phaseable[i]:
+                return i if crossed and self.walkable[i] else -1
+            crossed = True
+            x += step.x
+            y += step.y
+        return -1
+
+    def weighted(self, start: int, goal: int, hazards) -> list[tuple[int, int]]:
+        """
+        Dijkstra over moves and phases, with the cost of entering a cell taken
+        from a HazardMap. Firewall cells are passable but expensive. Returns
+        (cell, edge) pairs from start to goal where edge is -1 for a move and
+        the CARDINALS index for a phase.
+        """
+        self.expanded = 0
+        walkable, cells = self.walkable, self.cells
+        if not walkable[goal] and cells[goal] != FIREWALL:
+            return []
+        gen = self._next_generation()
+        seen, closed, g, parent = self.seen, self.closed, self.g, self.parent
+        neighbours = self.neighbours
+        ticks = {start: 0}
+        edges = {start: -1}
+        cost_of = hazards.entry_cost
+
+        seen[start] = gen
+        g[start] = 0
+        parent[start] = -1
+        heap = [(0, start)]
+
+        while heap:
+            cost, node = heappop(heap)
+            if node == goal:
+                return [(i, edges[i]) for i in self._reconstruct(goal)]
+            if closed[node] == gen:
+                continue
+            closed[node] = gen
+            self.expanded += 1
+            tick = ticks[node] + 1
+
+            moves = [(nb, -1) for nb in neighbours[node] if walkable[nb] or cells[nb] == FIREWALL]
+            for d in range(4):
+                landing = self.phase_landing(node, d)
+                if landing != -1:
+                    moves.append((landing, d))
+
+            for nb, edge in moves:
+                if closed[nb] == gen:
+                    continue
+                ncost = cost + cost_of(nb, tick)
+                if seen[nb] != gen or ncost < g[nb]:
+                    seen[nb] = gen
+                    g[nb] = ncost
+                    parent[nb] = node
+                    ticks[nb] = tick
+                    edges[nb] = edge
+                    heappush(heap, (ncost, nb))
+        return []
+
+    def _expand(self, jump_points: list[int]) -> list[int]:
+        """Fill in the straight segments between consecutive jump points"""
+        if not jump_points:
+            return []
+        path = [jump_points[0]]
+        for a, b in zip(jump_points, jump_points[1:]):
+            if self.ys[a] == self.ys[b]:
+                step = 1 if b > a else -1
+            else:
+                step = self.width if b > a else -self.width
+            path.extend(range(a + step, b + step, step))
+        return path
 
 class Pathfinder:
-    """Handles pathfinding using python-pathfinding library"""
-    
-    def __init__(self):
-        self.finder = AStarFinder(diagonal_movement=DiagonalMovement.never)
-    
+    """Handles pathfinding on a flat grid kept in sync with the game memory"""
+
+    def __init__(self, algorithm: str = "astar"):
+        self.grid = SearchGrid()
+        self.clusters = ClusterMap(self.grid)
+        self.algorithm = algorithm
+        self.owner = None  # memory feeding this grid through update_cell
+        self.revision = 0  # bumped whenever the walkability of a cell changes
+        self.changes = deque(maxlen=CHANGELOG_SIZE)  # (revision, cell index)
+
+    def update_cell(self, pos: Vector, cell: Cell):
+        """Update the walkability of a single cell"""
+        i = self.grid.index(pos)
+        if i != -1:
+            walkable = self.grid.walkable[i]
+            self.grid.set_cell(i, cell)
+            if walkable != self.grid.walkable[i]:
+                self.clusters.invalidate(i)
+                self.revision += 1
+                self.changes.append((self.revision, i))
+
+    def clear(self):
+        """Forget every known cell"""
+        self.grid.clear()
+        self.clusters.reset()
+        self.revision += 1
+        self.changes.clear()
+
+    def load_layout(self, codes: bytes):
+        """Replace the grid with a stored layout (see mapcache)"""
+        self.grid.load_cells(codes)
+        self.clusters.invalidate_all()
+        self.revision += 1
+        self.changes.clear()
+
+    def changed_since(self, revision: int) -> list[int]:
+        """
+        Cells whose walkability changed after the given revision, or None if
+        that is too old to tell (the grid was cleared or the log overflowed)
+        """
+        if revision == self.revision:
+            return []
+        if not self.changes or self.changes[0][0] > revision + 1:
+            return None
+        return [i for r, i in self.changes if r > revision]
+
+    def prepare(self):
+        """Precompute what can be reused by every game (called during warm-up)"""
+        self.grid.clear()
+        self.clusters.prepare_blank()
+
+    def load(self, memory):
+        """Rebuild the grid from scratch from a memory's known map"""
+        self.clear()
+        for pos, cell in memory.known_map.items():
+            self.update_cell(pos, cell)
+        self.owner = memory
+
     def find_path(self, start: Vector, end: Vector, memory) -> list[Vector]:
         """Find path from start to end considering known obstacles"""
         print(f"\n=== PATHFINDING REQUEST ===")
         print(f"Start: {start.x},{start.y} | Target: {end.x},{end.y}")
-        
-        # Create a grid from memory (1 = walkable, 0 = blocked)
-        width = 125  # Full map size
-        height = 125
-        grid_matrix = [[1 for _ in range(width)] for _ in range(height)]
-        
-        # Mark obstacles
-        for pos, cell in memory.known_map.items():
-            if cell in [Cell.firewall, Cell.via, Cell.resistance]:
-                if 0 <= pos.x < width and 0 <= pos.y < height:
-                    grid_matrix[pos.y][pos.x] = 0
-        
-        grid = Grid(matrix=grid_matrix)
-        start_node = grid.node(start.x, start.y)
-        end_node = grid.node(end.x, end.y)
-        
+
+        # The owning memory pushes cell changes as they happen, any other
+        # memory needs a full reload
+        if memory is not self.owner:
+            self.load(memory)
+
+        grid = self.grid
+        start_index = grid.index(start)
+        end_index = grid.index(end)
+        if start_index == -1 or end_index == -1:
+            print("No valid path found!")
+            return []
+
         print(f"Calculating path from {start.x},{start.y} to {end.x},{end.y}...")
-        
-        # Find path
-        path, runs = self.finder.find_path(start_node, end_node, grid)
-        
-        print(f"Pathfinding completed in {runs} steps")
+
+        if self.algorithm == "jps":
+            path = grid.jps(start_index, end_index)
+        elif self.algorithm == "bfs":
+            path = grid.bfs(start_index, end_index)
+        else:
+            path = grid.astar(start_index, end_index)
+
+        print(f"Pathfinding completed in {grid.expanded} steps")
         print(f"Path length: {len(path)} steps")
-        
+
         # Convert to Vector objects
-        vector_path = [Vector(x, y) for x, y in path]
-        
+        vector_path = [grid.position(i) for i in path]
+
         if len(vector_path) > 1:
             print(f"Next step: {vector_path[1].x},{vector_path[1].y}")
         else:
             print("No valid path found!")
-        
+
         return vector_path
-    
+
+    def find_actions(self, start: Vector, end: Vector, memory) -> list:
+        """
+        Weighted search that may phase through walls and avoids traps, the
+        firewall and projectiles. Returns the actions leading to end, or for
+        far targets only to a waypoint about LONG_RANGE cells along the
+        hierarchical path (the search is run again on the next ticks).
+        """
+        if memory is not self.owner:
+            self.load(memory)
+
+        grid = self.grid
+        start_index = grid.index(start)
+        end_index = grid.index(end)
+        if start_index == -1 or end_index == -1:
+            return []
+
+        goal = end_index
+        if abs(end.x - start.x) + abs(end.y - start.y) >= LONG_RANGE:
+            goal = self.waypoint(start_index, end_index)
+        steps = grid.weighted(start_index, goal, memory.get_hazards())
+        actions = []
+        for i, edge in steps[1:]:
+            if edge == -1:
+                actions.append(MoveAction(grid.position(i)))
+            else:
+                actions.append(PhaseAction(CARDINALS[edge]))
+        print(f"Weighted path: {len(actions)} actions ({sum(isinstance(a, PhaseAction) for a in actions)} phases)")
+        return actions
+
+    def waypoint(self, start: int, goal: int) -> int:
+        """
+        First node of the abstract path at least LONG_RANGE cells from start,
+        the goal itself if it is closer or can only be reached by phasing
+        """
+        abstract = self.clusters.abstract_path(start, goal)
+        xs, ys = self.grid.xs, self.grid.ys
+        for node in abstract[1:]:
+            if abs(xs[node] - xs[start]) + abs(ys[node] - ys[start]) >= LONG_RANGE:
+                print(f"Waypoint {xs[node]},{ys[node]} ({len(abstract)} abstract nodes, {self.clusters.expanded} expanded)")
+                return node
+        return goal
+
+    def find_long_path(self, start: Vector, end: Vector, memory) -> list[Vector]:
+        """
+        Hierarchical search for far targets. Only the first cells of the path
+        are refined, the rest of the route is known at the cluster level.
+        """
+        if memory is not self.owner:
+            self.load(memory)
+
+        grid = self.grid
+        start_index = grid.index(start)
+        end_index = grid.index(end)
+        if start_index == -1 or end_index == -1:
+            return []
+
+        abstract = self.clusters.abstract_path(start_index, end_index)
+        path = self.clusters.refine(abstract, REFINE_STEPS)
+        print(f"Hierarchical path: {len(abstract)} abstract nodes, {self.clusters.expanded} expanded")
+        return [grid.position(i) for i in path]
+
+    def is_reachable(self, start: Vector, end: Vector, memory) -> bool:
+        """Check if end can be reached from start"""
+        if abs(end.x - start.x) + abs(end.y - start.y) >= LONG_RANGE:
+            return len(self.find_long_path(start, end, memory)) > 0
+        return len(self.find_path(start, end, memory)) > 0
+
     def get_next_move(self, start: Vector, end: Vector, memory) -> Vector:
         """Get the next step toward the target"""
-        path = self.find_path(start, end, memory)
+        if abs(end.x - start.x) + abs(end.y - start.y) >= LONG_RANGE:
+            path = self.find_long_path(start, end, memory)
+        else:
+            path = self.find_path(start, end, memory)
         if len(path) > 1:
             return path[1]  # Next step after current position
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,170 @@
+import time
+from .types import *
+from .aiming import DIRECTIONS, MAX_RANGE
+from .hazards import NEVER
+from .inventory import placed_object, placed_pattern
+
+# Size (width, height) of the "Rectangle" walls when the server doesn't send
+# it, placeRectangleVertical swaps them
+RECTANGLE_SIZES = {
+    "Resistance": (3, 1),
+    "HugeResistance": (5, 2),
+}
+DEFAULT_RECTANGLE = (3, 1)
+
+# Distance between the player and the walls of a "Box" when the server doesn't send it
+BOX_RADIUS = 1
+
+# Pattern names of the walls built around the player ("square" in older docs)
+BOX_PATTERNS = ("box", "square")
+
+# Time budget of one search
+BUDGET = 0.02
+
+# Weights of the three terms of the score
+BLOCK_WEIGHT = 3.0   # an enemy line of fire toward the player is cut
+CHOKE_WEIGHT = 1.0   # a narrow cell on the enemies' shortest way to the player is closed
+TRAP_WEIGHT = 1.0    # a cell an enemy is likely to step on
+
+def footprint(item: InventoryItemPlaced, anchor: Vector, vertical: bool, player: Vector) -> list[Vector]:
+    """Cells covered by a placed item"""
+    name, params = placed_pattern(item)
+    if name == "rectangle":
+        width, height = RECTANGLE_SIZES.get(item.name, DEFAULT_RECTANGLE)
+        width, height = params.get("width", width), params.get("height", height)
+        if vertical:
+            width, height = height, width
+        return [Vector(anchor.x + dx, anchor.y + dy)
+                for dy in range(-(height // 2), height - height // 2)
+                for dx in range(-(width // 2), width - width // 2)]
+    if name in BOX_PATTERNS:
+        radius = box_radius(item)
+        return [Vector(player.x + dx, player.y + dy)
+                for dy in range(-radius, radius + 1)
+                for dx in range(-radius, radius + 1)
+                if max(abs(dx), abs(dy)) == radius]
+    return [anchor]
+
+def box_radius(item: InventoryItemPlaced) -> int:
+    return placed_pattern(item)[1].get("radius", BOX_RADIUS)
+
+class Placement:
+    """Where to place an item (absolute anchor) and its score"""
+
+    def __init__(self, item: InventoryItemPlaced, position: Vector, vertical: bool, score: float):
+        self.item = item
+        self.position = position
+        self.vertical = vertical
+        self.score = score
+
+class PlacementPlanner:
+    """
+    Picks the anchor and orientation of a wall or trap. The value of every
+    cell around the player is computed once from the enemy reach field and
+    the line-of-fire rays, then each legal placement is scored by summing the
+    values of the cells it covers.
+    """
+
+    def __init__(self, budget: float = BUDGET):
+        self.budget = budget
+        self.evaluated = 0
+
+    def cell_values(self, state: GameState, memory, radius: int, trap: bool) -> tuple[dict, dict]:
+        """
+        (x, y) -> value of covering that cell, for the cells within radius of
+        the player, and (x, y) -> direction of the threatened ray through it
+        (a ray only counts once, however many of its cells are covered)
+        """
+        reach = memory.get_enemy_reach()
+        grid = memory.pathfinder.grid
+        player = state.player.position
+        p = reach.index(player)
+        values, rays = {}, {}
+        # Nothing to defend against when no enemy can reach the player
+        if p == -1 or not memory.enemy_sightings or reach.arrival[p] == NEVER:
+            return values, rays
+
+        if not trap:
+            # Cells on a clear ray between the player and a cell an enemy can
+            # shoot from next tick
+            for d, step in enumerate(DIRECTIONS):
+                length = min(memory.rays.reach(player, d), MAX_RANGE)
+                threatened = False
+                for k in range(length, 0, -1):
+                    i = reach.index(Vector(player.x + step.x * k, player.y + step.y * k))
+                    threatened = threatened or reach.shooters[i]
+                    if threatened and k <= radius + 2:
+                        rays[(player.x + step.x * k, player.y + step.y * k)] = d
+
+        # Cells on the enemies' shortest way to the player, narrow ones first
+        target = reach.arrival[p]
+        for dy in range(-radius - 2, radius + 3):
+            for dx in range(-radius - 2, radius + 3):
+                i = reach.index(Vector(player.x + dx, player.y + dy))
+                if i == -1 or not grid.walkable[i] or (dx == 0 and dy == 0):
+                    continue
+                distance = reach.player_distance[i]
+                if distance < 0 or reach.arrival[i] + distance > target + 1:
+                    continue
+                if trap:
+                    value = TRAP_WEIGHT
+                else:
+                    closed = sum(1 for nb in grid.neighbours[i] if not grid.walkable[nb])
+                    value = CHOKE_WEIGHT * (1 + closed) / 4
+                key = (player.x + dx, player.y + dy)
+                values[key] = values.get(key, 0) + value
+        return values, rays
+
+    def legal(self, state: GameState, memory, cells: list[Vector], occupied: set) -> bool:
+        grid = memory.pathfinder.grid
+        for pos in cells:
+            i = grid.index(pos)
+            if i == -1 or not grid.walkable[i] or pos in occupied or memory.known_map.get(pos) == Cell.chest:
+                return False
+        return True
+
+    def best_placement(self, state: GameState, memory, item: InventoryItemPlaced) -> Placement:
+        """Best placement of the item, or None if no legal placement is worth anything"""
+        trap = "trap" in placed_object(item)
+        pattern = placed_pattern(item)[0]
+        player = state.player.position
+        values, rays = self.cell_values(state, memory, max(item.range, box_radius(item)), trap)
+        if not values and not rays:
+            return None
+        # The budget is for the placements, the reach fields above may be built cold
+        start = time.perf_counter()
+
+        occupied = {player}
+        occupied.update(obj.position for obj in state.objects)
+        occupied.update(enemy.position for enemy in state.enemies)
+
+        if pattern in BOX_PATTERNS:
+            anchors = [player]
+        else:
+            anchors = [Vector(player.x + dx, player.y + dy)
+                       for dy in range(-item.range, item.range + 1)
+                       for dx in range(-item.range, item.range + 1)
+                       if 0 < abs(dx) + abs(dy) <= item.range]
+            # Closest anchors first, in case the budget runs out
+            anchors.sort(key=lambda a: (a - player).manhattan_distance())
+        orientations = (False, True) if pattern == "rectangle" else (False,)
+
+        best = None
+        self.evaluated = 0
+        for anchor in anchors:
+            if time.perf_counter() - start > self.budget:
+                break
+            for vertical in orientations:
+                cells = footprint(item, anchor, vertical, player)
+                if not self.legal(state, memory, cells, occupied):
+                    continue
+                self.evaluated += 1
+                keys = [(c.x, c.y) for c in cells]
+                cut = BLOCK_WEIGHT * len(set(rays[key] for key in keys if key in rays))
+                closed = sum(values.get(key, 0) for key in keys)
+                if not cut and not closed:
+                    continue
+                score = cut + closed
+                if best is None or score > best.score:
+                    best = Placement(item, anchor, vertical, score)
+        return best
@@ -0,0 +1,116 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# Seconds between two samples of the main thread
+SAMPLE_INTERVAL = 0.002
+
+# Samples kept in the ring buffer (a few seconds, more than any tick)
+RING_SIZE = 4096
+
+# A tick is slow when it takes more than this fraction of the compute budget
+DEFAULT_THRESHOLD = 0.7
+
+def frame_label(code) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SlowTickProfiler:
+    """
+    Opt-in sampling profiler: a background thread records the stack of the
+    main thread every SAMPLE_INTERVAL into a ring buffer. When a tick takes
+    longer than the threshold, the samples of that tick are written as
+    collapsed stacks (flamegraph.pl / speedscope format) next to the raw tick
+    message, so the tick can be replayed offline. The files are written by
+    flush(), once the action has been sent.
+
+    Enabled by setting JDIS_PROFILE to a folder; JDIS_PROFILE_THRESHOLD
+    changes the fraction of the budget (0.7 by default).
+    """
+
+    def __init__(self, directory: str, budget: float, threshold: float = DEFAULT_THRESHOLD):
+        self.directory = directory
+        self.limit = budget * threshold
+        self.samples = deque(maxlen=RING_SIZE)  # (time, code objects from root to leaf)
+        self.thread_id = threading.main_thread().ident
+        self.ticks = 0
+        self.dumps = 0
+        self.pending = []  # (tick, data, start, end) of slow ticks waiting to be written
+        os.makedirs(directory, exist_ok=True)
+        self.running = True
+        self.thread = threading.Thread(target=self._sample, name="tick-profiler", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def from_env(budget: float):
+        directory = os.getenv("JDIS_PROFILE")
+        if not directory:
+            return None
+        threshold = float(os.getenv("JDIS_PROFILE_THRESHOLD", DEFAULT_THRESHOLD))
+        return SlowTickProfiler(directory, budget, threshold)
+
+    def _sample(self):
+        samples, thread_id = self.samples, self.thread_id
+        while self.running:
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            samples.append((time.perf_counter(), tuple(stack)))
+            del frame
+            time.sleep(SAMPLE_INTERVAL)
+
+    def stop(self):
+        self.running = False
+
+    def collapse(self, start: float, end: float) -> dict:
+        """Collapsed stack -> number of samples taken between start and end"""
+        stacks = {}
+        for t, stack in list(self.samples):
+            if start <= t <= end:
+                key = ";".join(frame_label(code) for code in stack)
+                stacks[key] = stacks.get(key, 0) + 1
+        return stacks
+
+    def capture(self, data: str):
+        """Context manager around one tick, `data` is the raw server message"""
+        return _TickCapture(self, data)
+
+    def flush(self):
+        """Write the slow ticks queued by capture(), once the action has been sent"""
+        pending, self.pending = self.pending, []
+        for tick, data, start, end in pending:
+            self.dump(tick, data, start, end)
+
+    def dump(self, tick: int, data: str, start: float, end: float):
+        elapsed = (end - start) * 1000
+        name = os.path.join(self.directory, f"tick-{tick:05d}-{elapsed:.0f}ms")
+        stacks = self.collapse(start, end)
+        with open(name + ".folded", "w") as f:
+            for stack, count in sorted(stacks.items(), key=lambda s: -s[1]):
+                f.write(f"{stack} {count}\n")
+        with open(name + ".json", "w") as f:
+            f.write(data)
+        self.dumps += 1
+        print(f"Slow tick ({elapsed:.0f}ms): {sum(stacks.values())} samples written to {name}.folded")
+
+class _TickCapture:
+    def __init__(self, profiler: SlowTickProfiler, data: str):
+        self.profiler = profiler
+        self.data = data
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # Also keeps ticks cancelled by the timeout. Writing the files is left
+        # to flush(), this tick is already late
+        end = time.perf_counter()
+        self.profiler.ticks += 1
+        if end - self.start > self.profiler.limit:
+            self.profiler.pending.append((self.profiler.ticks, self.data, self.start, end))
+        return False
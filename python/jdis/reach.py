@@ -0,0 +1,116 @@
+from collections import deque
+from .types import *
+from .constants import MAP_SIZE
+from .hazards import NEVER
+from .aiming import DIRECTIONS, MAX_RANGE
+
+# Enemies not seen for this many ticks could be anywhere, they are forgotten
+ENEMY_MEMORY_TICKS = 30
+
+def sightings_key(sightings: dict) -> tuple:
+    """Hashable summary of the enemy sightings, to tell whether they changed"""
+    return tuple(sorted((name, pos.x, pos.y, seen) for name, (pos, seen) in sightings.items()))
+
+# Cells an enemy can reach within this many ticks are cells it could shoot from
+FIRE_HORIZON = 1
+
+# Only enemies seen within this many ticks feed the line of fire: an enemy
+# seen long ago could be anywhere and would cover most of the map
+FIRE_SIGHTING_TICKS = 2
+
+class EnemyReach:
+    """
+    Where the enemies could be, from their last sightings: the earliest tick
+    at which any enemy can arrive on each cell (one multi-source BFS, an enemy
+    seen k ticks ago starts k steps ahead), and the cells an enemy could shoot
+    at next tick (rays of the RayTable from every cell a recently seen enemy
+    can reach by then).
+    Against the player's distance field this splits the map into cells the
+    player reaches first (safe) and cells an enemy reaches first.
+
+    The distance field, tick and sightings default to the memory's current
+    ones, the Speculator passes the ones predicted for the next tick.
+    """
+
+    def __init__(self, memory, distances: list[int] = None, tick: int = None, sightings: dict = None,
+                 width: int = MAP_SIZE, height: int = MAP_SIZE):
+        self.width = width
+        self.height = height
+        size = width * height
+        self.arrival = [NEVER] * size
+        self.shooters = bytearray(size)  # cells an enemy could shoot from next tick
+        self.line_of_fire = bytearray(size)
+        self.player_distance = distances if distances is not None else memory.get_distance_field()
+        tick = memory.tick if tick is None else tick
+        sightings = memory.enemy_sightings if sightings is None else sightings
+
+        grid = memory.pathfinder.grid
+        sources = []
+        for position, seen in sightings.values():
+            i = grid.index(position)
+            if i != -1:
+                sources.append((seen - tick, i))
+        if not sources:
+            return
+        sources.sort()
+
+        # BFS where every source enters the queue once the search reaches its
+        # start tick, so the queue stays ordered by arrival
+        arrival, walkable, neighbours = self.arrival, grid.walkable, grid.neighbours
+        queue = deque()
+        k = 0
+        while queue or k < len(sources):
+            if not queue or (k < len(sources) and sources[k][0] <= arrival[queue[0]]):
+                t, i = sources[k]
+                k += 1
+                if arrival[i] > t:
+                    arrival[i] = t
+                    queue.append(i)
+                continue
+            node = queue.popleft()
+            t = arrival[node] + 1
+            for nb in neighbours[node]:
+                if walkable[nb] and arrival[nb] > t:
+                    arrival[nb] = t
+                    queue.append(nb)
+        self.arrival = [t if t > 0 else 0 for t in arrival]
+
+        # Cells a recent sighting reaches within FIRE_HORIZON, one small BFS each
+        held = set()
+        for t, start in sources:
+            if -t > FIRE_SIGHTING_TICKS:
+                continue
+            seen, frontier = {start}, [start]
+            for _ in range(FIRE_HORIZON - t):
+                ring = []
+                for node in frontier:
+                    for nb in neighbours[node]:
+                        if walkable[nb] and nb not in seen:
+                            seen.add(nb)
+                            ring.append(nb)
+                frontier = ring
+            held |= seen
+
+        rays, shooters, line_of_fire = memory.rays, self.shooters, self.line_of_fire
+        for i in held:
+            shooters[i] = 1
+            x, y = i % width, i // width
+            for d, step in enumerate(DIRECTIONS):
+                reach = rays.clear[d][i]
+                for k in range(1, min(reach, MAX_RANGE) + 1):
+                    line_of_fire[(y + step.y * k) * width + x + step.x * k] = 1
+
+    def index(self, pos: Vector) -> int:
+        if 0 <= pos.x < self.width and 0 <= pos.y < self.height:
+            return pos.y * self.width + pos.x
+        return -1
+
+    def margin(self, i: int) -> int:
+        """Ticks the player has on the enemies at a cell, negative if an enemy is there first"""
+        d = self.player_distance[i]
+        return self.arrival[i] - d if d >= 0 else -NEVER
+
+    def is_safe(self, pos: Vector) -> bool:
+        """The player gets there before any enemy and can't be shot there next tick"""
+        i = self.index(pos)
+        return i != -1 and not self.line_of_fire[i] and self.margin(i) > 0
@@ -0,0 +1,267 @@
+import random
+import time
+from .utils import *
+from .constants import SCORING, FIREWALL_DAMAGE
+from .hazards import PROJECTILE_HORIZON
+from .pathfinding import CARDINALS, FIREWALL
+
+# The forward model covers a (2 * RADIUS + 1)^2 window around the player
+RADIUS = 7
+
+# Rollout depth in ticks and time budget of a whole search
+DEPTH = 8
+BUDGET = 0.12
+MAX_ROLLOUTS = 2000
+
+# A tick is 500ms, survive_5_seconds is worth that much every 10 ticks
+SURVIVE_PER_TICK = SCORING["survive_5_seconds"] / 10
+
+# Rewards further in the future count less
+DISCOUNT = 0.95
+
+# Value of the player's HP, of the expected damage of a shot and of the
+# PlacementPlanner score of a wall or trap, in points
+HP_VALUE = 0.1
+SHOT_VALUE = 0.25
+PLACE_VALUE = 1.0
+
+# Action kinds
+MOVE, PHASE, OPEN_CHEST, BUFF, SHOOT, NUKE, SKIP, PLACE = range(8)
+
+class ForwardModel:
+    """
+    Struct-of-arrays copy of the neighbourhood of the player. The map arrays
+    never change during a rollout and are shared between clones; only the
+    chests and traps (which can disappear) and a few scalars are copied.
+    """
+
+    __slots__ = ("size", "x0", "y0", "grid", "walkable", "fire_eta", "danger",
+                 "chests", "traps", "player", "hp", "shield", "score", "weight", "tick", "alive")
+
+    @staticmethod
+    def from_game(state: GameState, memory) -> "ForwardModel":
+        model = ForwardModel()
+        size = model.size = 2 * RADIUS + 1
+        origin = state.player.position
+        model.x0, model.y0 = origin.x - RADIUS, origin.y - RADIUS
+        grid = model.grid = memory.pathfinder.grid
+        hazards = memory.get_hazards()
+
+        # Window of the map and of the hazards shared with the weighted search
+        model.walkable = bytearray(size * size)
+        model.fire_eta = [1 << 30] * (size * size)
+        model.danger = [0] * (size * size)
+        for ly in range(size):
+            for lx in range(size):
+                i = grid.index(Vector(model.x0 + lx, model.y0 + ly))
+                if i == -1:
+                    continue
+                li = ly * size + lx
+                model.walkable[li] = grid.walkable[i] or grid.cells[i] == FIREWALL
+                model.fire_eta[li] = hazards.fire_eta[i]
+                model.danger[li] = hazards.danger[i]
+
+        model.chests = bytearray(size * size)
+        model.traps = bytearray(size * size)
+        for pos, obj in memory.last_seen.items():
+            li = model.local(pos)
+            if li == -1:
+                continue
+            if isinstance(obj, ObjectChest) and memory.is_chest_unopened(pos):
+                model.chests[li] = 1
+            elif isinstance(obj, ObjectTrap):
+                model.traps[li] = min(255, obj.damage)
+
+        model.player = model.local(origin)
+        model.hp = state.player.hp
+        model.shield = state.player.shield
+        model.score = 0.0
+        model.weight = 1.0
+        model.tick = 0
+        model.alive = True
+        return model
+
+    def local(self, pos: Vector) -> int:
+        lx, ly = pos.x - self.x0, pos.y - self.y0
+        if 0 <= lx < self.size and 0 <= ly < self.size:
+            return ly * self.size + lx
+        return -1
+
+    def clone(self) -> "ForwardModel":
+        other = ForwardModel()
+        other.size, other.x0, other.y0 = self.size, self.x0, self.y0
+        other.grid, other.walkable = self.grid, self.walkable
+        other.fire_eta, other.danger = self.fire_eta, self.danger
+        other.chests = bytearray(self.chests)
+        other.traps = bytearray(self.traps)
+        other.player, other.hp, other.shield = self.player, self.hp, self.shield
+        other.score, other.weight = self.score, self.weight
+        other.tick, other.alive = self.tick, self.alive
+        return other
+
+    def step_target(self, d: int) -> int:
+        """Cell reached by moving in CARDINALS[d], or -1"""
+        step = CARDINALS[d]
+        lx, ly = self.player % self.size + step.x, self.player // self.size + step.y
+        if 0 <= lx < self.size and 0 <= ly < self.size:
+            li = ly * self.size + lx
+            if self.walkable[li]:
+                return li
+        return -1
+
+    def phase_target(self, d: int) -> int:
+        """Cell reached by phasing in CARDINALS[d] (same rules as the weighted search), or -1"""
+        i = self.grid.index(Vector(self.x0 + self.player % self.size, self.y0 + self.player // self.size))
+        if i == -1:
+            return -1
+        landing = self.grid.phase_landing(i, d)
+        return self.local(self.grid.position(landing)) if landing != -1 else -1
+
+    def adjacent_chest(self) -> int:
+        lx, ly = self.player % self.size, self.player // self.size
+        for step in CARDINALS + (Vector(0, 0),):
+            x, y = lx + step.x, ly + step.y
+            if 0 <= x < self.size and 0 <= y < self.size and self.chests[y * self.size + x]:
+                return y * self.size + x
+        return -1
+
+    def damage(self, amount: int):
+        absorbed = min(self.shield, amount)
+        self.shield -= absorbed
+        self.hp -= amount - absorbed
+
+    def apply(self, kind: int, arg):
+        """Play one tick: the action, then traps, firewall and projectiles"""
+        score = 0
+        if kind == MOVE or kind == PHASE:
+            self.player = arg
+        elif kind == OPEN_CHEST:
+            self.chests[arg] = 0
+            score += SCORING["open_chest"]
+        elif kind == BUFF:
+            effect, power = arg
+            if effect in (BuffEffect.heal, BuffEffect.healAndShield):
+                self.hp = min(100, self.hp + power)
+            if effect in (BuffEffect.shield, BuffEffect.healAndShield):
+                self.shield = min(100, self.shield + power)
+            score += SCORING["use_buff"]
+        elif kind == SHOOT or kind == NUKE or kind == PLACE:
+            score += arg
+
+        self.tick += 1
+        trap = self.traps[self.player]
+        if trap:
+            self.traps[self.player] = 0
+            self.damage(trap)
+            score += SCORING["step_on_trap"]
+        if self.fire_eta[self.player] <= self.tick:
+            self.damage(FIREWALL_DAMAGE)
+        if self.tick <= PROJECTILE_HORIZON and self.danger[self.player]:
+            self.damage(self.danger[self.player])
+
+        if self.hp <= 0:
+            self.alive = False
+            score += SCORING["get_eliminated"]
+        else:
+            score += SURVIVE_PER_TICK
+        self.score += score * self.weight
+        self.weight *= DISCOUNT
+
+    def moves(self) -> list[tuple]:
+        """Actions of the default policy: skip or move, avoiding known traps and fire"""
+        result = [(SKIP, None)]
+        tick = self.tick + 1
+        for d in range(4):
+            li = self.step_target(d)
+            if li != -1 and not self.traps[li] and self.fire_eta[li] > tick:
+                result.append((MOVE, li))
+        return result
+
+    def value(self) -> float:
+        return self.score + (self.hp + self.shield) * HP_VALUE if self.alive else self.score
+
+class RolloutSearch:
+    """
+    Enumerates the legal actions of this tick and plays random rollouts from
+    each of them over a ForwardModel, keeping the one with the best average
+    score (SCORING table).
+    """
+
+    def __init__(self, depth: int = DEPTH, budget: float = BUDGET, seed: int = None):
+        self.depth = depth
+        self.budget = budget
+        self.rng = random.Random(seed)
+        self.rollouts = 0
+
+    def candidates(self, state: GameState, memory, model: ForwardModel) -> list[tuple]:
+        """(kind, model argument, real action) for every legal action"""
+        result = [(SKIP, None, do_nothing(state))]
+        for d, direction in enumerate(CARDINALS):
+            li = model.step_target(d)
+            if li != -1:
+                result.append((MOVE, li, move(state, direction)))
+            li = model.phase_target(d)
+            if li != -1:
+                result.append((PHASE, li, phase(state, direction)))
+
+        li = model.adjacent_chest()
+        if li != -1:
+            chest = ObjectChest(Vector(model.x0 + li % model.size, model.y0 + li // model.size))
+            result.append((OPEN_CHEST, li, open_chest(state, chest)))
+
+        inventory = memory.inventory
+        for effects in ((BuffEffect.heal, BuffEffect.healAndShield), (BuffEffect.shield,)):
+            item = inventory.best_buff(*effects)
+            if item:
+                result.append((BUFF, (item.effect, item.power), use_buff(state, item)))
+
+        shot = memory.aimer.best_shot(state, memory)
+        if shot:
+            result.append((SHOOT, shot.value * SHOT_VALUE, use_projectile(state, shot.weapon, shot.direction)))
+
+        # Walls and traps get the static value of their placement, the model
+        # doesn't simulate the enemies they hold back
+        for item in (inventory.best_wall, inventory.best_trap):
+            placement = memory.placer.best_placement(state, memory, item) if item else None
+            if placement:
+                offset = placement.position - state.player.position
+                result.append((PLACE, placement.score * PLACE_VALUE,
+                               use_placed(state, item, offset, placement.vertical)))
+
+        if inventory.nuke and state.enemies:
+            result.append((NUKE, SCORING["eliminate_player"] * len(state.enemies), use_nuke(state, inventory.nuke)))
+        return result
+
+    def rollout(self, model: ForwardModel, kind: int, arg) -> float:
+        sim = model.clone()
+        sim.apply(kind, arg)
+        choice = self.rng.choice
+        for _ in range(self.depth - 1):
+            if not sim.alive:
+                break
+            chest = sim.adjacent_chest()
+            if chest != -1:
+                sim.apply(OPEN_CHEST, chest)
+            else:
+                sim.apply(*choice(sim.moves()))
+        return sim.value()
+
+    def best_action(self, state: GameState, memory):
+        start = time.perf_counter()
+        model = ForwardModel.from_game(state, memory)
+        candidates = self.candidates(state, memory, model)
+        totals = [0.0] * len(candidates)
+        counts = [0] * len(candidates)
+
+        # Round-robin over the candidates until the budget is spent
+        self.rollouts = 0
+        while self.rollouts < MAX_ROLLOUTS and time.perf_counter() - start < self.budget:
+            for c, (kind, arg, _) in enumerate(candidates):
+                totals[c] += self.rollout(model, kind, arg)
+                counts[c] += 1
+                self.rollouts += 1
+
+        best = max(range(len(candidates)), key=lambda c: totals[c] / counts[c] if counts[c] else float("-inf"))
+        print(f"Rollout search: {self.rollouts} rollouts over {len(candidates)} actions "
+              f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+        return candidates[best][2]
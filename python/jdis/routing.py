@@ -0,0 +1,121 @@
+from .types import *
+
+# Chests farther than this (in steps) from the player or from each other are
+# not considered
+ROUTE_HORIZON = 80
+
+# Exact route search is exponential, only the closest chests are considered
+MAX_ROUTE_CHESTS = 8
+
+# Ticks spent opening a chest once next to it
+OPEN_TICKS = 1
+
+class ChestRoutePlanner:
+    """
+    Plans the order in which to open every known unopened chest. Keeps one
+    distance field per chest, giving the pairwise distance matrix; the fields
+    are repaired in place as cells change instead of being recomputed. The
+    route maximises the chests opened before the firewall reaches them.
+    """
+
+    def __init__(self, pathfinder):
+        self.pathfinder = pathfinder
+        self.fields = {}  # candidate chest cell index -> distance field
+        self.revision = pathfinder.revision
+        self.recomputed = 0
+        self.repaired = 0
+
+    def known_chests(self, memory) -> list[Vector]:
+        """Unopened chests seen at any point in the game (or cached), not only in view"""
+        chests = {pos for pos, obj in memory.last_seen.items() if isinstance(obj, ObjectChest)}
+        chests.update(pos for pos, cell in memory.known_map.items() if cell == Cell.chest)
+        chests.update(memory.tentative_chests)  # from a previous game on this map
+        # A chest seen earlier is gone once its cell shows something else
+        # (opened by someone else)
+        return [pos for pos in chests
+                if memory.is_chest_unopened(pos) and memory.known_map.get(pos, Cell.chest) == Cell.chest]
+
+    def _repair(self):
+        """Bring every distance field up to date with the cells changed since the last plan"""
+        changed = self.pathfinder.changed_since(self.revision)
+        self.revision = self.pathfinder.revision
+        if changed is None:
+            self.fields.clear()
+            return
+        if not changed:
+            return
+        grid = self.pathfinder.grid
+        for chest, field in list(self.fields.items()):
+            if grid.walkable[chest]:
+                grid.repair_field(field, changed)
+                self.repaired += 1
+            else:
+                del self.fields[chest]
+
+    def field(self, i: int) -> list[int]:
+        field = self.fields.get(i)
+        if field is None:
+            field = self.fields[i] = self.pathfinder.grid.distance_field(i)
+            self.recomputed += 1
+        return field
+
+    def plan(self, memory) -> list[Vector]:
+        """Chests to open, in order"""
+        grid = self.pathfinder.grid
+        self._repair()
+
+        chests = set(grid.index(pos) for pos in self.known_chests(memory))
+        chests.discard(-1)
+
+        start = memory.get_distance_field()
+        candidates = sorted((i for i in chests if 0 <= start[i] <= ROUTE_HORIZON), key=lambda i: start[i])
+        candidates = candidates[:MAX_ROUTE_CHESTS]
+
+        # Only the candidates keep a field (at most MAX_ROUTE_CHESTS of them)
+        for stale in set(self.fields).difference(candidates):
+            del self.fields[stale]
+        if not candidates:
+            return []
+
+        n = len(candidates)
+        fire_eta = memory.get_fire_eta()
+        matrix = [[self.field(a)[b] for b in candidates] for a in candidates]
+        deadline = [fire_eta[i] for i in candidates]
+
+        # dp[mask][last] = earliest tick at which the chests of mask are all
+        # opened, finishing with last, each before the firewall reaches it
+        INF = 1 << 30
+        dp = [[INF] * n for _ in range(1 << n)]
+        parent = [[-1] * n for _ in range(1 << n)]
+        for c in range(n):
+            t = start[candidates[c]] + OPEN_TICKS
+            if t < deadline[c]:
+                dp[1 << c][c] = t
+
+        best_mask, best_last = 0, -1
+        for mask in range(1, 1 << n):
+            for last in range(n):
+                t = dp[mask][last]
+                if t == INF:
+                    continue
+                count, best_count = bin(mask).count("1"), bin(best_mask).count("1")
+                if count > best_count or (count == best_count and t < dp[best_mask][best_last]):
+                    best_mask, best_last = mask, last
+                for c in range(n):
+                    if mask & (1 << c):
+                        continue
+                    d = matrix[last][c]
+                    if d < 0 or d > ROUTE_HORIZON:
+                        continue
+                    arrival = t + d + OPEN_TICKS
+                    if arrival < deadline[c] and arrival < dp[mask | (1 << c)][c]:
+                        dp[mask | (1 << c)][c] = arrival
+                        parent[mask | (1 << c)][c] = last
+
+        route = []
+        mask, last = best_mask, best_last
+        while last != -1:
+            route.append(grid.position(candidates[last]))
+            mask, last = mask & ~(1 << last), parent[mask][last]
+        route.reverse()
+        return route
@@ -0,0 +1,167 @@
+import asyncio
+import time
+from .types import *
+from .hazards import firewall_eta
+from .pathfinding import CARDINALS
+from .reach import EnemyReach, ENEMY_MEMORY_TICKS, sightings_key
+from .exploration import VIEW_RADIUS
+
+class Speculation:
+    """Results precomputed for one predicted player position"""
+
+    def __init__(self, position: Vector, revision: int):
+        self.position = position
+        self.revision = revision  # pathfinder revision the results were computed on
+        self.distances = None
+        self.distances_elapsed = 0.0
+        self.fire_count = -1
+        self.fire_eta = None
+        self.fire_elapsed = 0.0
+        self.sightings = None  # sightings_key the enemy reach was built from
+        self.reach = None
+        self.reach_elapsed = 0.0
+        self.revealed = -1  # explorer cells revealed once the view at position is seen
+        self.explored = False  # explore_target was computed (it can be None)
+        self.explore_target = None
+        self.explore_elapsed = 0.0
+
+class Speculator:
+    """
+    Uses the idle time between sending an action and receiving the next tick
+    to precompute, for the positions the player will likely be at, the
+    distance field, the firewall arrival field, the enemy reach (threat map)
+    and the exploration target. The next tick uses each of them if the
+    prediction was right and its inputs didn't change in the meantime.
+    The rest of the HazardMap (traps and projectiles) changes every tick and
+    is cheap once the fire eta is known, it isn't speculated.
+    """
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.results = {}
+        self.task = None
+
+        # Counters, kept across games
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.time_saved = 0.0
+
+    def predict(self, action) -> list[Vector]:
+        """Likely positions at the next tick, most likely first"""
+        current = self.memory.last_player_position
+        if current is None:
+            return []
+        if isinstance(action, MoveAction):
+            return [action.position, current]  # the move may be blocked
+        if isinstance(action, PhaseAction):
+            grid = self.memory.pathfinder.grid
+            start = grid.index(current)
+            if start != -1 and action.direction in CARDINALS:
+                landing = grid.phase_landing(start, CARDINALS.index(action.direction))
+                if landing != -1:
+                    return [grid.position(landing), current]
+        return [current]
+
+    def start(self, action):
+        """Start speculating in the background once the action has been sent"""
+        self.cancel()
+        self.results = {}
+        positions = self.predict(action)
+        if positions:
+            self.task = asyncio.get_running_loop().create_task(self._run(positions))
+
+    def cancel(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        self.task = None
+
+    async def _run(self, positions: list[Vector]):
+        memory = self.memory
+        pathfinder = memory.pathfinder
+        for position in positions:
+            i = pathfinder.grid.index(position)
+            if i == -1:
+                continue
+            result = Speculation(position, pathfinder.revision)
+            self.results[position] = result
+
+            # Yield between each piece so an incoming tick is never delayed
+            # by more than one of them
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            result.distances = pathfinder.grid.distance_field(i)
+            result.distances_elapsed = time.perf_counter() - start
+
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            result.fire_count = memory.burning_count
+            result.fire_eta = firewall_eta(memory.burning)
+            result.fire_elapsed = time.perf_counter() - start
+
+            # The sightings the next tick keeps if no enemy is seen
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            tick = memory.tick + 1
+            sightings = {name: sighting for name, sighting in memory.enemy_sightings.items()
+                         if tick - sighting[1] <= ENEMY_MEMORY_TICKS}
+            result.sightings = sightings_key(sightings)
+            result.reach = EnemyReach(memory, result.distances, tick, sightings)
+            result.reach_elapsed = time.perf_counter() - start
+
+            # Exploration target once the view around the position is revealed
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            explorer = memory.explorer.copy()
+            for dy in range(-VIEW_RADIUS, VIEW_RADIUS + 1):
+                for dx in range(-VIEW_RADIUS, VIEW_RADIUS + 1):
+                    explorer.reveal(Vector(position.x + dx, position.y + dy))
+            result.revealed = explorer.revealed
+            result.explore_target = explorer.best_target(memory, result.distances, result.fire_eta, result.reach)
+            result.explored = True
+            result.explore_elapsed = time.perf_counter() - start
+
+    def lookup(self, position: Vector) -> Speculation:
+        """
+        Speculated results for the current position, or None. Parts computed
+        on an outdated map are dropped. Call once per tick, after the memory
+        update.
+        """
+        self.cancel()
+        result = self.results.get(position)
+        self.results = {}
+        if result is None:
+            self.misses += 1
+            return None
+
+        memory = self.memory
+        if result.revision != memory.pathfinder.revision:
+            result.distances = None
+        if result.fire_count != memory.burning_count:
+            result.fire_eta = None
+        if result.distances is None or result.sightings != sightings_key(memory.enemy_sightings):
+            result.reach = None
+        if result.reach is None or result.fire_eta is None or result.revealed != memory.explorer.revealed:
+            result.explored = False
+
+        if result.distances is None:
+            self.stale += 1
+        else:
+            self.hits += 1
+            self.time_saved += result.distances_elapsed
+        if result.fire_eta is not None:
+            self.time_saved += result.fire_elapsed
+        if result.reach is not None:
+            self.time_saved += result.reach_elapsed
+        if result.explored:
+            self.time_saved += result.explore_elapsed
+        return result
+
+    def report(self) -> str:
+        total = self.hits + self.misses + self.stale
+        rate = self.hits / total * 100 if total else 0
+        return (f"Speculation: {self.hits} hits, {self.misses} misses, {self.stale} stale "
+                f"({rate:.0f}% hit rate), {self.time_saved * 1000:.1f}ms saved")
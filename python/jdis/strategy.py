@@ -3,6 +3,11 @@ from typing import Union
 from .utils import *
 from .memory import GameMemory
 from .constants import SCORING
+from .rollout import RolloutSearch
+from .pathfinding import CARDINALS
+
+# Priority of a chest next to the player, below AttackStrategy (80)
+CHEST_PRIORITY = 75
 
 class Strategy(ABC):
     """Base strategy class"""
@@ -19,33 +24,34 @@ class NukeStrategy(Strategy):
     """Use nuke if available"""
     
     async def execute(self, state: GameState, memory: GameMemory):
-        for item in state.player.inventory:
-            if isinstance(item, InventoryItemNuke):
-                return use_nuke(state, item)
-        return None
+        nuke = memory.inventory.nuke
+        return use_nuke(state, nuke) if nuke else None
     
     def get_priority(self, state: GameState, memory: GameMemory) -> float:
-        for item in state.player.inventory:
-            if isinstance(item, InventoryItemNuke):
-                return 100  # Highest priority if we have a nuke
-        return 0
+        return 100 if memory.inventory.nuke else 0  # Highest priority if we have a nuke
 
 class ChestStrategy(Strategy):
-    """Open nearby chests"""
+    """Open known chests following the planned route"""
     
     async def execute(self, state: GameState, memory: GameMemory):
-        for obj in state.objects:
-            if isinstance(obj, ObjectChest) and memory.is_chest_unopened(obj.position):
-                # Check if chest is reachable
-                if memory.is_position_reachable(obj.position):
-                    return open_chest(state, obj)
-        return None
+        route = memory.get_chest_route()
+        if not route:
+            return None
+        target = route[0]
+        if (target - state.player.position).manhattan_distance() <= 1:
+            # Counted as opened once the memory sees it gone (see GameMemory.update)
+            memory.pending_chests.setdefault(target, memory.tick)
+            return open_chest(state, ObjectChest(target))
+        actions = memory.pathfinder.find_actions(state.player.position, target, memory)
+        return actions[0] if actions else None
     
     def get_priority(self, state: GameState, memory: GameMemory) -> float:
-        # Higher priority if we see unopened chests
-        unopened_chests = sum(1 for obj in state.objects 
-                             if isinstance(obj, ObjectChest) and memory.is_chest_unopened(obj.position))
-        return min(90, unopened_chests * 30)
+        # Closer chests first, but never above attacking or defending
+        route = memory.get_chest_route()
+        if not route:
+            return 0
+        distance = memory.get_distance_field()[memory.pathfinder.grid.index(route[0])]
+        return max(30, CHEST_PRIORITY - distance)
 
 class AttackStrategy(Strategy):
     """Attack nearby enemies"""
@@ -54,65 +60,77 @@ class AttackStrategy(Strategy):
         if not state.enemies:
             return None
             
-        # Find best weapon to use
-        best_weapon = None
-        for item in state.player.inventory:
-            if isinstance(item, InventoryItemProjectile) and item.quantity > 0:
-                if best_weapon is None or item.damage > best_weapon.damage:
-                    best_weapon = item
-        
-        if best_weapon:
-            # Find closest enemy
-            closest_enemy = min(state.enemies, 
-                              key=lambda e: (e.position - state.player.position).manhattan_distance())
-            direction = memory.get_direction_toward(closest_enemy.position)
-            return use_projectile(state, best_weapon, direction)
+        # Best weapon and direction against current and predicted enemy positions
+        shot = memory.aimer.best_shot(state, memory)
+        if shot:
+            print(f"Firing {shot.weapon.name} toward {shot.direction.x},{shot.direction.y} (expected {shot.value:.0f})")
+            return use_projectile(state, shot.weapon, shot.direction)
         
         return None
     
     def get_priority(self, state: GameState, memory: GameMemory) -> float:
         if not state.enemies:
             return 0
-        # Higher priority if we have weapons and enemies are close
-        has_weapons = any(isinstance(item, InventoryItemProjectile) and item.quantity > 0 
-                         for item in state.player.inventory)
-        return 80 if has_weapons else 0
+        # Only worth it if a shot can actually hit someone
+        return 80 if memory.aimer.best_shot(state, memory) else 0
 
 class DefenseStrategy(Strategy):
     """Defensive actions (healing, shields, walls)"""
     
-    async def execute(self, state: GameState, memory: GameMemory):
+    def __init__(self):
+        self._state = None  # state the planned action was computed for
+        self._action = None
+    
+    def plan(self, state: GameState, memory: GameMemory):
+        """Defensive action for this tick, None if no item can be used (computed once per state)"""
+        if self._state is state:
+            return self._action
+        self._state = state
+        self._action = None
+        inventory = memory.inventory
+
         # Use healing if low HP
         if state.player.hp < 50:
-            for item in state.player.inventory:
-                if isinstance(item, InventoryItemBuff) and item.effect == BuffEffect.heal:
-                    return use_buff(state, item)
+            item = inventory.best_buff(BuffEffect.heal, BuffEffect.healAndShield)
+            if item:
+                self._action = use_buff(state, item)
+                return self._action
         
         # Use shield if available and low shield
         if state.player.shield < 30:
-            for item in state.player.inventory:
-                if isinstance(item, InventoryItemBuff) and item.effect == BuffEffect.shield:
-                    return use_buff(state, item)
+            item = inventory.best_buff(BuffEffect.shield, BuffEffect.healAndShield)
+            if item:
+                self._action = use_buff(state, item)
+                return self._action
         
-        # Place defensive walls if enemies nearby
-        if len(state.enemies) > 0:
-            for item in state.player.inventory:
-                if isinstance(item, InventoryItemPlaced) and "Resistance" in item.name:
-                    # Place wall between us and closest enemy
-                    closest_enemy = min(state.enemies, 
-                                      key=lambda e: (e.position - state.player.position).manhattan_distance())
-                    direction = memory.get_direction_toward(closest_enemy.position)
-                    return use_placed(state, item, direction)
+        # Place defensive walls (cutting lines of fire and chokepoints), or
+        # traps on the enemies' way to us
+        for item in (inventory.best_wall, inventory.best_trap):
+            if item:
+                placement = memory.placer.best_placement(state, memory, item)
+                if placement:
+                    print(f"Placing {item.name} at {placement.position.x},{placement.position.y} (score {placement.score:.1f})")
+                    self._action = use_placed(state, item, placement.position - state.player.position, placement.vertical)
+                    return self._action
         
         return None
     
+    async def execute(self, state: GameState, memory: GameMemory):
+        return self.plan(state, memory)
+    
     def get_priority(self, state: GameState, memory: GameMemory) -> float:
+        # Nothing to do without an item to use
+        if self.plan(state, memory) is None:
+            return 0
         priority = 0
         if state.player.hp < 50:
             priority += 70
         if state.player.shield < 30:
             priority += 50
-        if len(state.enemies) > 0:
+        # Enemies in view, or close enough to shoot us next tick
+        reach = memory.get_enemy_reach()
+        i = reach.index(state.player.position)
+        if len(state.enemies) > 0 or (i != -1 and reach.line_of_fire[i]):
             priority += 40
         return min(85, priority)
 
@@ -120,6 +138,22 @@ class EscapeFirewallStrategy(Strategy):
     """Escape from approaching firewall"""
     
     async def execute(self, state: GameState, memory: GameMemory):
+        # Step the firewall reaches last, then out of the enemies' line of
+        # fire, then the farthest from them
+        fire_eta = memory.get_fire_eta()
+        reach = memory.get_enemy_reach()
+        grid = memory.pathfinder.grid
+        best, best_key = None, None
+        for direction in CARDINALS:
+            i = grid.index(state.player.position + direction)
+            if i == -1 or not grid.walkable[i]:
+                continue
+            key = (fire_eta[i], not reach.line_of_fire[i], reach.arrival[i])
+            if best_key is None or key > best_key:
+                best, best_key = direction, key
+        if best is not None:
+            return move(state, best)
+
         # Get safest direction (away from firewall)
         safe_dir = memory.get_safest_direction()
         if safe_dir:
@@ -140,23 +174,20 @@ class ExploreStrategy(Strategy):
     """Enhanced exploration with boundary awareness"""
     
     async def execute(self, state: GameState, memory: GameMemory):
-        # First check for reachable chests
-        for obj in state.objects:
-            if isinstance(obj, ObjectChest) and memory.is_chest_unopened(obj.position):
-                path = memory.pathfinder.find_path(state.player.position, obj.position, memory)
-                if len(path) > 1:
-                    next_step = path[1]
-                    print(f"Moving toward chest at {obj.position.x},{obj.position.y}")
-                    return move(state, next_step - state.player.position)
+        # First head to the next chest of the route
+        for chest in memory.get_chest_route()[:1]:
+            actions = memory.pathfinder.find_actions(state.player.position, chest, memory)
+            if actions:
+                print(f"Moving toward chest at {chest.x},{chest.y}")
+                return actions[0]
         
         # Explore new areas
         explore_target = memory.get_next_explore_position()
         if explore_target:
-            path = memory.pathfinder.find_path(state.player.position, explore_target, memory)
-            if len(path) > 1:
-                next_step = path[1]
+            actions = memory.pathfinder.find_actions(state.player.position, explore_target, memory)
+            if actions:
                 print(f"Exploring toward {explore_target.x},{explore_target.y}")
-                return move(state, next_step - state.player.position)
+                return actions[0]
         
         # Fallback: move randomly if stuck
         print("No clear path - making random move")
@@ -165,10 +196,22 @@ class ExploreStrategy(Strategy):
     def get_priority(self, state: GameState, memory: GameMemory) -> float:
         return 25  # Lower than attack/defense priorities
 
+class RolloutStrategy(Strategy):
+    """Simulate every legal action a few ticks ahead and keep the best one"""
+    
+    def __init__(self):
+        self.search = RolloutSearch()
+    
+    async def execute(self, state: GameState, memory: GameMemory):
+        return self.search.best_action(state, memory)
+    
+    def get_priority(self, state: GameState, memory: GameMemory) -> float:
+        return 100
+
 class StrategySelector:
     """Selects the best strategy based on current game state"""
     
-    def __init__(self):
+    def __init__(self, use_search: bool = False):
         self.strategies = [
             NukeStrategy(),
             EscapeFirewallStrategy(),
@@ -177,8 +220,12 @@ class StrategySelector:
             AttackStrategy(),
             ExploreStrategy()
         ]
+        # Search mode: rollouts over a forward model instead of fixed priorities
+        self.search = RolloutStrategy() if use_search else None
     
     def select_strategy(self, state: GameState, memory: GameMemory) -> Strategy:
+        if self.search:
+            return self.search
         # Get strategy with highest priority
         best_strategy = max(self.strategies, 
                            key=lambda s: s.get_priority(state, memory))
@@ -15,6 +15,9 @@ class Vector:
         if not isinstance(other, Vector): return NotImplemented
         return Vector(self.x - other.x, self.y - other.y)
 
+    def manhattan_distance(self):
+        return abs(self.x) + abs(self.y)
+
 CardinalDirection = Enum({
     "up": Vector(0, -1),
     "down": Vector(0, 1),
@@ -144,8 +147,8 @@ class InventoryItemPlaced:
     remaining_ticks: int
     quantity: int
 
-    object: str
-    pattern: str
+    object: object  # name, or {"type": "wall" | "trap", ...}
+    pattern: object  # name, or {"type": "single" | "rectangle" | "box", ...} (see placed_pattern)
     range: int
 
 @serde
@@ -0,0 +1,110 @@
+import asyncio
+import contextlib
+import io
+import json
+import time
+import traceback
+from .types import *
+from .encoding import encode_action
+from . import bot
+
+# CPython specializes the bytecode of a function after a few executions, run
+# the dry-run tick enough times for the decoder and tick paths to be hot
+WARMUP_ROUNDS = 10
+
+# Background warm-up task, see start_warm_up
+_task = None
+
+def synthetic_tick(x: int = 62, y: int = 62) -> str:
+    """A tickInfo message using every kind of field the server sends"""
+    data = ["pcb"] * 49
+    data[0] = "via"
+    data[6] = "resistance"
+    data[42] = "firewall"
+    data[48] = "chest"
+    player = {
+        "name": "warmup", "score": 0, "kills": 0, "hp": 100, "shield": 0,
+        "position": {"x": x, "y": y}, "last_position": {"x": x, "y": y},
+        "inventory": [
+            {"type": "buff", "name": "Repair", "remaining_ticks": 0, "quantity": 5, "effect": "heal", "power": 10, "duration": 0},
+            {"type": "projectile", "name": "Delete", "remaining_ticks": 0, "quantity": 1, "range": 1, "speed": 1, "damage": 50, "pattern": "Single"},
+            {"type": "placed", "name": "SimpleResistance", "remaining_ticks": 0, "quantity": 4, "object": "resistance", "pattern": "Single", "range": 4},
+            {"type": "nuke", "name": "Bluescreen", "remaining_ticks": 10, "quantity": 0, "damage": 199},
+        ],
+        "effects": [{"name": "Buffer", "effect": "shield", "power": 10, "duration": 0}],
+    }
+    enemy = dict(player, name="enemy", inventory=[], effects=[],
+                 position={"x": x + 2, "y": y}, last_position={"x": x + 2, "y": y})
+    return json.dumps({
+        "type": "tickInfo",
+        "state": {
+            "player": player,
+            "enemies": [enemy],
+            "stats": {},
+            "ground": {"width": 7, "height": 7, "data": data, "offset": {"x": x - 3, "y": y - 3}},
+            "objects": [
+                {"type": "chest", "position": {"x": x + 3, "y": y + 3}},
+                {"type": "trap", "position": {"x": x - 1, "y": y + 1}, "owner": "enemy", "name": "WindowsDefender", "damage": 10},
+                {"type": "resistance", "position": {"x": x + 3, "y": y - 3}, "hp": 10},
+            ],
+            "projectiles": [{"name": "Ping", "position": {"x": x, "y": y - 2}, "remainingTicks": 5, "speed": 1, "damage": 20}],
+        },
+    })
+
+async def warm_up():
+    """
+    Prepare everything the first tick needs: deferred imports, reusable map
+    structures, decoder/encoder paths and a dry-run tick on a synthetic state.
+    Yields to the event loop between each step so server messages are never
+    held back. The memory is reset afterwards so nothing leaks into the real
+    game, also when the warm-up is cancelled by stop_warm_up().
+    """
+    start = time.perf_counter()
+    bot.setup()
+    await asyncio.sleep(0)
+    text = synthetic_tick()
+    failures = {}  # strategy name -> first exception
+
+    # The synthetic map must not end up in the map cache
+    map_cache, bot.memory.map_cache = bot.memory.map_cache, None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            bot.memory.pathfinder.prepare()
+        for _ in range(WARMUP_ROUNDS):
+            await asyncio.sleep(0)
+            with contextlib.redirect_stdout(io.StringIO()):
+                msg = ServerMessage.from_json(text)
+                action = await bot.on_tick(msg.state)
+                encode_action(action)
+                for strategy in bot.strategy_selector.strategies:
+                    try:
+                        encode_action(await strategy.execute(msg.state, bot.memory))
+                    except Exception as e:
+                        # A broken strategy must not prevent the bot from starting
+                        failures.setdefault(type(strategy).__name__, e)
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            await bot.on_game_start()
+            bot.memory.speculator.reset_counters()
+        bot.memory.map_cache = map_cache
+        for name, e in failures.items():
+            print(f"WARNING: {name} failed during the warm-up:")
+            traceback.print_exception(e)
+
+    print(f"Warm-up done in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+def start_warm_up() -> asyncio.Task:
+    """Run warm_up() in the background while waiting for the game"""
+    global _task
+    _task = asyncio.create_task(warm_up())
+    return _task
+
+async def stop_warm_up():
+    """Called before handling a game message: cancel the warm-up if it's still running"""
+    if _task is None or _task.done():
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        print("Warm-up cancelled, the game started")